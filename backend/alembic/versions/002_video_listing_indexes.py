@@ -0,0 +1,42 @@
+"""video listing keyset indexes
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PUBLIC_PUBLISHED = sa.text("visibility = 'public' AND status = 'published'")
+
+
+def upgrade() -> None:
+    # 稼働中のテーブルをロックしないよう CONCURRENTLY で作成
+    with op.get_context().autocommit_block():
+        # sort=new: (published_at, id)
+        op.create_index(
+            'ix_videos_public_published_at_id', 'videos',
+            [sa.text('published_at DESC'), sa.text('id DESC')],
+            postgresql_where=PUBLIC_PUBLISHED,
+            postgresql_concurrently=True,
+        )
+        # sort=popular: (view_count, id)
+        op.create_index(
+            'ix_videos_public_view_count_id', 'videos',
+            [sa.text('view_count DESC'), sa.text('id DESC')],
+            postgresql_where=PUBLIC_PUBLISHED,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_videos_public_view_count_id', table_name='videos', postgresql_concurrently=True)
+        op.drop_index('ix_videos_public_published_at_id', table_name='videos', postgresql_concurrently=True)
@@ -0,0 +1,76 @@
+"""video full text search
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# title > tags > description の順に重み付け
+SEARCH_VECTOR_EXPR = """
+    setweight(to_tsvector('simple', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string({row}tags, ' '), '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce({row}description, '')), 'C')
+"""
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.add_column('videos', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # array_to_string は IMMUTABLE ではないため生成列ではなくトリガーで維持する
+    op.execute(f"""
+        CREATE FUNCTION videos_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR_EXPR.format(row='NEW.')};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER videos_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF title, description, tags ON videos
+        FOR EACH ROW EXECUTE FUNCTION videos_search_vector_update()
+    """)
+
+    # 既存行のバックフィル
+    op.execute(f"UPDATE videos SET search_vector = {SEARCH_VECTOR_EXPR.format(row='')}")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_videos_search_vector', 'videos', ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_videos_title_trgm', 'videos', ['title'],
+            postgresql_using='gin',
+            postgresql_ops={'title': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_videos_description_trgm', 'videos', ['description'],
+            postgresql_using='gin',
+            postgresql_ops={'description': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_videos_description_trgm', table_name='videos', postgresql_concurrently=True)
+        op.drop_index('ix_videos_title_trgm', table_name='videos', postgresql_concurrently=True)
+        op.drop_index('ix_videos_search_vector', table_name='videos', postgresql_concurrently=True)
+    op.execute("DROP TRIGGER IF EXISTS videos_search_vector_trigger ON videos")
+    op.execute("DROP FUNCTION IF EXISTS videos_search_vector_update()")
+    op.drop_column('videos', 'search_vector')
@@ -0,0 +1,31 @@
+"""progressive publish statuses
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE はトランザクション外で実行する
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE videostatus ADD VALUE IF NOT EXISTS 'playable' AFTER 'processing'")
+        op.execute("ALTER TYPE videostatus ADD VALUE IF NOT EXISTS 'partially_ready' AFTER 'playable'")
+
+    op.add_column('videos', sa.Column('ready_renditions', postgresql.ARRAY(sa.String()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('videos', 'ready_renditions')
+    # PostgreSQL は enum 値の削除に対応していないため、途中状態の動画を処理中に戻すだけにする
+    op.execute("UPDATE videos SET status = 'processing' WHERE status IN ('playable', 'partially_ready')")
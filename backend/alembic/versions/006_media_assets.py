@@ -0,0 +1,43 @@
+"""content-addressed media assets
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('media_assets',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content_hash', sa.String(64), nullable=False),
+        sa.Column('status', sa.Enum('processing', 'ready', name='mediaassetstatus'), nullable=False),
+        sa.Column('source_key', sa.String(500), nullable=False),
+        sa.Column('storage_prefix', sa.String(500), nullable=False),
+        sa.Column('hls_master_url', sa.String(500), nullable=True),
+        sa.Column('thumbnail_url', sa.String(500), nullable=True),
+        sa.Column('ready_renditions', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('duration', sa.Integer(), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash'),
+    )
+    op.add_column('videos', sa.Column('asset_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.create_foreign_key('fk_videos_asset_id', 'videos', 'media_assets', ['asset_id'], ['id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_videos_asset_id', 'videos', type_='foreignkey')
+    op.drop_column('videos', 'asset_id')
+    op.drop_table('media_assets')
+    op.execute('DROP TYPE mediaassetstatus')
@@ -0,0 +1,31 @@
+"""comment listing keyset index
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 稼働中のテーブルをロックしないよう CONCURRENTLY で作成
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_comments_video_active_created_at_id', 'comments',
+            ['video_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_comments_video_active_created_at_id', table_name='comments', postgresql_concurrently=True)
@@ -0,0 +1,30 @@
+"""watch history recent index
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 稼働中のテーブルをロックしないよう CONCURRENTLY で作成
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_watch_history_user_updated_at', 'watch_history',
+            ['user_id', sa.text('updated_at DESC')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_watch_history_user_updated_at', table_name='watch_history', postgresql_concurrently=True)
@@ -1,4 +1,4 @@
-from .auth import router as auth_router, get_current_user
+from .auth import router as auth_router, get_current_user, get_token_principal
 from .channels import router as channels_router
 from .videos import router as videos_router
 from .interactions import router as interactions_router
@@ -7,38 +7,88 @@ from sqlalchemy import select
 from ..database import get_db
 from ..models import User
 from ..schemas import UserCreate, UserResponse, TokenResponse
-from ..core import get_password_hash, verify_password, create_access_token, decode_access_token
+from ..core import create_access_token, decode_access_token, password_hasher, PasswordHasherBusyError
+from ..core.config import settings
+from ..core.principal import Principal, principal_cache
 
 router = APIRouter(prefix="/auth", tags=["認証"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-) -> User:
-    """現在のユーザーを取得"""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="認証情報が無効です",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="混み合っています。しばらくしてから再度お試しください",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _decode_user_id(token: str) -> tuple[UUID, dict]:
+    """トークンからユーザーIDとペイロードを取得"""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
-    user_id = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
+    try:
+        return UUID(payload["sub"]), payload
+    except (KeyError, TypeError, ValueError):
+        raise _credentials_exception()
+
+
+def create_user_token(user: User) -> str:
+    """ユーザーのアクセストークンを生成"""
+    claims = {"sub": str(user.id)}
+    if settings.jwt_embed_principal:
+        claims.update(role=user.role.value, status=user.status.value)
+    return create_access_token(data=claims)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """現在のユーザーを取得（プリンシパルキャッシュ経由）"""
+    user_id, _ = _decode_user_id(token)
     
-    result = await db.execute(select(User).where(User.id == UUID(user_id)))
-    user = result.scalar_one_or_none()
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        result = await db.execute(
+            select(User.id, User.role, User.status).where(User.id == user_id)
+        )
+        row = result.first()
+        
+        if row is None:
+            raise _credentials_exception()
+        
+        principal = Principal(id=row.id, role=row.role.value, status=row.status.value)
+        principal_cache.set(principal)
     
-    if user is None:
-        raise credentials_exception
+    return principal
+
+
+async def get_token_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    """トークンのクレームから現在のユーザーを取得（読み取り系エンドポイント用）
+    
+    jwt_embed_principal が有効で role/status クレームがあればDBを参照しない。
+    クレームは発行時点の値のため、role・status の変更の反映はトークン失効まで遅れる。
+    """
+    user_id, payload = _decode_user_id(token)
     
-    return user
+    if settings.jwt_embed_principal and "role" in payload and "status" in payload:
+        return Principal(id=user_id, role=payload["role"], status=payload["status"])
+    
+    return await get_current_user(token, db)
 
 
 @router.post("/signup", response_model=TokenResponse)
@@ -54,10 +104,15 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
             detail="このメールアドレスは既に登録されています"
         )
     
-    # ユーザー作成
+    # ユーザー作成（ハッシュ計算はイベントループ外で行う）
+    try:
+        password_hash = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusyError:
+        raise _busy_exception()
+    
     user = User(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         display_name=user_data.display_name,
     )
     db.add(user)
@@ -65,7 +120,7 @@ async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     await db.refresh(user)
     
     # トークン生成
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_user_token(user)
     
     return TokenResponse(
         access_token=access_token,
@@ -82,14 +137,26 @@ async def login(
     result = await db.execute(select(User).where(User.email == form_data.username))
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await password_hasher.verify_and_update(form_data.password, user.password_hash)
+        except PasswordHasherBusyError:
+            raise _busy_exception()
+    
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="メールアドレスまたはパスワードが正しくありません",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": str(user.id)})
+    # コスト設定が変わっていれば新しいハッシュに置き換える
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    
+    access_token = create_user_token(user)
     
     return TokenResponse(
         access_token=access_token,
@@ -98,6 +165,15 @@ async def login(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """現在のユーザー情報を取得"""
-    return UserResponse.model_validate(current_user)
+    result = await db.execute(select(User).where(User.id == current_user.id))
+    user = result.scalar_one_or_none()
+    
+    if user is None:
+        raise _credentials_exception()
+    
+    return UserResponse.model_validate(user)
@@ -1,20 +1,27 @@
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
 from ..database import get_db
-from ..models import Channel, Video, User
+from ..models import Channel, Video
 from ..schemas import ChannelCreate, ChannelUpdate, ChannelResponse, VideoResponse
+from ..core import response_cache
+from ..core.config import settings
+from ..core.principal import Principal
 from .auth import get_current_user
 
 router = APIRouter(prefix="/channels", tags=["チャンネル"])
 
+_video_list = TypeAdapter(list[VideoResponse])
+
 
 @router.post("", response_model=ChannelResponse)
 async def create_channel(
     channel_data: ChannelCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """チャンネル作成"""
@@ -33,23 +40,29 @@ async def create_channel(
 @router.get("/{channel_id}", response_model=ChannelResponse)
 async def get_channel(
     channel_id: UUID,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """チャンネル詳細を取得"""
-    result = await db.execute(select(Channel).where(Channel.id == channel_id))
-    channel = result.scalar_one_or_none()
-    
-    if not channel:
-        raise HTTPException(status_code=404, detail="チャンネルが見つかりません")
+    async def build():
+        result = await db.execute(select(Channel).where(Channel.id == channel_id))
+        channel = result.scalar_one_or_none()
+        
+        if not channel:
+            raise HTTPException(status_code=404, detail="チャンネルが見つかりません")
+        
+        return ChannelResponse.model_validate(channel).model_dump_json(), [response_cache.channel_tag(channel_id)]
     
-    return ChannelResponse.model_validate(channel)
+    return await response_cache.cached_response(
+        request, f"channel:{channel_id}", build, settings.response_cache_ttl_seconds
+    )
 
 
 @router.patch("/{channel_id}", response_model=ChannelResponse)
 async def update_channel(
     channel_id: UUID,
     channel_data: ChannelUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """チャンネル更新"""
@@ -69,6 +82,7 @@ async def update_channel(
     
     await db.commit()
     await db.refresh(channel)
+    await response_cache.invalidate(response_cache.channel_tag(channel_id), response_cache.LISTING_TAG)
     
     return ChannelResponse.model_validate(channel)
 
@@ -76,16 +90,24 @@ async def update_channel(
 @router.get("/{channel_id}/videos", response_model=list[VideoResponse])
 async def get_channel_videos(
     channel_id: UUID,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
     """チャンネルの動画一覧を取得"""
-    result = await db.execute(
-        select(Video)
-        .where(Video.channel_id == channel_id)
-        .where(Video.visibility == "public")
-        .where(Video.status == "published")
-        .order_by(Video.published_at.desc())
-    )
-    videos = result.scalars().all()
+    async def build():
+        result = await db.execute(
+            select(Video)
+            .options(joinedload(Video.channel))
+            .where(Video.channel_id == channel_id)
+            .where(Video.visibility == "public")
+            .where(Video.status == "published")
+            .order_by(Video.published_at.desc())
+        )
+        videos = result.scalars().all()
+        
+        body = _video_list.dump_json([VideoResponse.model_validate(v) for v in videos]).decode()
+        return body, [response_cache.channel_tag(channel_id)]
     
-    return [VideoResponse.model_validate(v) for v in videos]
+    return await response_cache.cached_response(
+        request, f"channel:{channel_id}:videos", build, settings.response_cache_ttl_seconds
+    )
@@ -1,75 +1,102 @@
 from uuid import UUID
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, exists, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import joinedload, selectinload
 
 from ..database import get_db
-from ..models import Comment, CommentStatus, Like, Report, Video, User
-from ..schemas import CommentCreate, CommentResponse, CommentListResponse, ReportCreate, ReportResponse
-from .auth import get_current_user
+from ..models import Comment, CommentStatus, Like, Report, Video, VideoVisibility, WatchHistory, PLAYABLE_STATUSES
+from ..schemas import (
+    CommentCreate, CommentResponse, CommentListResponse, ReportCreate, ReportResponse, VideoResponse,
+    WatchHeartbeatBatch, ContinueWatchingItem, ContinueWatchingResponse,
+)
+from ..core.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from ..core import watch_history
+from ..core.config import settings
+from ..core.principal import Principal
+from .auth import get_current_user, get_token_principal
 
 router = APIRouter(tags=["インタラクション"])
 
 
 # ========== いいね ==========
 
+def _like_statement(user_id: UUID, video_id: UUID):
+    """いいね登録と like_count の加算を1文で行う
+
+    INSERT ... ON CONFLICT DO NOTHING で実際に追加された場合のみカウンタを進める。
+    既にいいね済みなら行を更新せず現在の値を返し、動画が無ければ行を返さない。
+    """
+    videos = Video.__table__
+    inserted = (
+        pg_insert(Like.__table__)
+        .from_select(
+            ["user_id", "video_id", "created_at"],
+            select(literal(user_id), videos.c.id, func.now()).where(videos.c.id == video_id),
+        )
+        .on_conflict_do_nothing()
+        .returning(Like.__table__.c.video_id)
+        .cte("inserted")
+    )
+    return _counter_statement(video_id, inserted, videos.c.like_count + 1)
+
+
+def _unlike_statement(user_id: UUID, video_id: UUID):
+    """いいね解除と like_count の減算を1文で行う"""
+    videos = Video.__table__
+    deleted = (
+        delete(Like.__table__)
+        .where(Like.__table__.c.user_id == user_id, Like.__table__.c.video_id == video_id)
+        .returning(Like.__table__.c.video_id)
+        .cte("deleted")
+    )
+    return _counter_statement(video_id, deleted, func.greatest(videos.c.like_count - 1, 0))
+
+
+def _counter_statement(video_id: UUID, changed, like_count):
+    """changed に行があればカウンタを更新し、いずれの場合も最新の like_count を返す"""
+    videos = Video.__table__
+    updated = (
+        update(videos)
+        .where(videos.c.id == video_id, exists(select(changed.c.video_id)))
+        .values(like_count=like_count)
+        .returning(videos.c.like_count)
+        .cte("updated")
+    )
+    unchanged = select(videos.c.like_count).where(videos.c.id == video_id, ~exists(select(changed.c.video_id)))
+    return select(updated.c.like_count).union_all(unchanged)
+
+
+async def _apply_like(db: AsyncSession, statement, liked: bool) -> dict:
+    result = await db.execute(statement)
+    like_count = result.scalar_one_or_none()
+    if like_count is None:
+        raise HTTPException(status_code=404, detail="動画が見つかりません")
+    await db.commit()
+    return {"liked": liked, "like_count": like_count}
+
+
+@router.put("/videos/{video_id}/like")
 @router.post("/videos/{video_id}/like")
 async def like_video(
     video_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """動画にいいね"""
-    # 動画存在チェック
-    video_result = await db.execute(select(Video).where(Video.id == video_id))
-    video = video_result.scalar_one_or_none()
-    if not video:
-        raise HTTPException(status_code=404, detail="動画が見つかりません")
-    
-    # 既存のいいねチェック
-    like_result = await db.execute(
-        select(Like).where(Like.user_id == current_user.id, Like.video_id == video_id)
-    )
-    existing_like = like_result.scalar_one_or_none()
-    
-    if existing_like:
-        raise HTTPException(status_code=400, detail="既にいいねしています")
-    
-    # いいね追加
-    like = Like(user_id=current_user.id, video_id=video_id)
-    db.add(like)
-    video.like_count += 1
-    await db.commit()
-    
-    return {"liked": True, "like_count": video.like_count}
+    """動画にいいね（冪等：いいね済みでもエラーにしない）"""
+    return await _apply_like(db, _like_statement(current_user.id, video_id), liked=True)
 
 
 @router.delete("/videos/{video_id}/like")
 async def unlike_video(
     video_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """いいねを解除"""
-    video_result = await db.execute(select(Video).where(Video.id == video_id))
-    video = video_result.scalar_one_or_none()
-    if not video:
-        raise HTTPException(status_code=404, detail="動画が見つかりません")
-    
-    like_result = await db.execute(
-        select(Like).where(Like.user_id == current_user.id, Like.video_id == video_id)
-    )
-    existing_like = like_result.scalar_one_or_none()
-    
-    if not existing_like:
-        raise HTTPException(status_code=400, detail="いいねしていません")
-    
-    await db.delete(existing_like)
-    video.like_count = max(0, video.like_count - 1)
-    await db.commit()
-    
-    return {"liked": False, "like_count": video.like_count}
+    """いいねを解除（冪等：いいねしていなくてもエラーにしない）"""
+    return await _apply_like(db, _unlike_statement(current_user.id, video_id), liked=False)
 
 
 # ========== コメント ==========
@@ -77,20 +104,45 @@ async def unlike_video(
 @router.get("/videos/{video_id}/comments", response_model=CommentListResponse)
 async def get_comments(
     video_id: UUID,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="前ページの next_cursor"),
     db: AsyncSession = Depends(get_db)
 ):
-    """動画のコメント一覧を取得"""
-    result = await db.execute(
+    """動画のコメント一覧を取得（新しい順、カーソルページネーション）"""
+    # 総数は集計せず、動画のコメント数カウンタを使う
+    video_result = await db.execute(select(Video.comment_count).where(Video.id == video_id))
+    row = video_result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="動画が見つかりません")
+    
+    # 投稿者はページ単位で1クエリにまとめて取得する
+    query = (
         select(Comment)
+        .options(selectinload(Comment.user))
         .where(Comment.video_id == video_id)
         .where(Comment.status == CommentStatus.ACTIVE)
-        .order_by(Comment.created_at.desc())
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
     )
+    if cursor:
+        try:
+            last_created_at, last_id = decode_cursor(cursor, 2)
+            last_created_at = datetime.fromisoformat(last_created_at)
+            last_id = UUID(last_id)
+        except (InvalidCursorError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+        query = query.where(tuple_(Comment.created_at, Comment.id) < tuple_(last_created_at, last_id))
+    
+    result = await db.execute(query.limit(limit))
     comments = result.scalars().all()
     
+    next_cursor = None
+    if len(comments) == limit:
+        next_cursor = encode_cursor(comments[-1].created_at, comments[-1].id)
+    
     return CommentListResponse(
         comments=[CommentResponse.model_validate(c) for c in comments],
-        total=len(comments)
+        total=row.comment_count or 0,
+        next_cursor=next_cursor,
     )
 
 
@@ -98,7 +150,7 @@ async def get_comments(
 async def create_comment(
     video_id: UUID,
     comment_data: CommentCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """コメント投稿"""
@@ -117,7 +169,15 @@ async def create_comment(
     db.add(comment)
     video.comment_count += 1
     await db.commit()
-    await db.refresh(comment)
+    
+    # 投稿者情報を含めて返す
+    result = await db.execute(
+        select(Comment)
+        .options(joinedload(Comment.user))
+        .where(Comment.id == comment.id)
+        .execution_options(populate_existing=True)
+    )
+    comment = result.scalar_one()
     
     return CommentResponse.model_validate(comment)
 
@@ -126,7 +186,7 @@ async def create_comment(
 async def delete_comment(
     video_id: UUID,
     comment_id: UUID,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """コメント削除"""
@@ -155,12 +215,84 @@ async def delete_comment(
     return {"deleted": True}
 
 
+# ========== 視聴履歴 ==========
+
+@router.post("/history/heartbeats", status_code=202)
+async def record_watch_heartbeats(
+    data: WatchHeartbeatBatch,
+    current_user: Principal = Depends(get_token_principal),
+):
+    """再生位置のハートビート（バッファに積み、定期タスクでDBへ反映）"""
+    if len(data.heartbeats) > settings.watch_history_max_heartbeats:
+        raise HTTPException(status_code=400, detail="位置更新の件数が多すぎます")
+    
+    # 同じ動画の位置は最後のものだけ残す
+    positions = {heartbeat.video_id: heartbeat.position_sec for heartbeat in data.heartbeats}
+    if positions:
+        await watch_history.record_heartbeats(current_user.id, positions)
+    
+    return {"accepted": len(positions)}
+
+
+@router.get("/history/continue-watching", response_model=ContinueWatchingResponse)
+async def get_continue_watching(
+    limit: int = Query(20, ge=1, le=50),
+    current_user: Principal = Depends(get_token_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """続きから見る：最近視聴した動画と再生位置"""
+    recent = await watch_history.get_recent(current_user.id, limit)
+    
+    # DB の履歴で埋めていなければ（失効・デプロイ直後など）DBから読んでマージする
+    if recent is None:
+        result = await db.execute(
+            select(WatchHistory.video_id, WatchHistory.last_position_sec, WatchHistory.updated_at)
+            .where(WatchHistory.user_id == current_user.id)
+            .order_by(WatchHistory.updated_at.desc())
+            .limit(settings.watch_history_recent_size)
+        )
+        rows = [
+            (str(row.video_id), row.last_position_sec or 0, row.updated_at.replace(tzinfo=timezone.utc).timestamp())
+            for row in result.all()
+        ]
+        await watch_history.fill_recent(current_user.id, rows)
+        recent = await watch_history.get_recent(current_user.id, limit) or []
+    
+    if not recent:
+        return ContinueWatchingResponse(items=[])
+    
+    result = await db.execute(
+        select(Video)
+        .options(joinedload(Video.channel))
+        .where(
+            Video.id.in_([UUID(video_id) for video_id, _, _ in recent]),
+            Video.visibility != VideoVisibility.PRIVATE,
+            Video.status.in_(PLAYABLE_STATUSES),
+        )
+    )
+    videos = {str(v.id): v for v in result.scalars().all()}
+    
+    items = []
+    for video_id, position_sec, watched_at in recent:
+        video = videos.get(video_id)
+        # 見終わった動画は除く
+        if video is None or (video.duration and position_sec >= video.duration * 0.95):
+            continue
+        items.append(ContinueWatchingItem(
+            video=VideoResponse.model_validate(video),
+            position_sec=position_sec,
+            watched_at=datetime.utcfromtimestamp(watched_at),
+        ))
+    
+    return ContinueWatchingResponse(items=items)
+
+
 # ========== 通報 ==========
 
 @router.post("/reports", response_model=ReportResponse)
 async def create_report(
     report_data: ReportCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """通報を送信"""
@@ -1,41 +1,76 @@
+import hashlib
+import math
 from datetime import datetime
 from uuid import UUID
-import boto3
-from botocore.config import Config
-from fastapi import APIRouter, Depends, HTTPException, Query
+import redis
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, func
+from sqlalchemy import select, func, tuple_, update, delete, any_, literal
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.orm import joinedload
 
 from ..database import get_db
-from ..models import Video, VideoStatus, VideoVisibility, Channel, User
+from ..models import Video, VideoStatus, VideoVisibility, Channel, MediaAsset, Comment, Like, WatchHistory
 from ..schemas import (
-    VideoCreate, VideoUpdate, VideoResponse, VideoListResponse,
-    UploadInitResponse, UploadCompleteRequest
+    VideoCreate, VideoUpdate, VideoResponse, VideoListResponse, VideoCardResponse, VideoBatchResponse,
+    UploadInitResponse, UploadCompleteRequest, UploadPartUrlsRequest, UploadPartUrlsResponse,
 )
 from ..core.config import settings
+from ..core import view_counter, response_cache, ranking
+from ..core.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from ..core.redis import get_redis
+from ..core.storage import get_storage, StorageError
+from ..core.search import apply_search, search_rank
+from ..core.principal import Principal
 from .auth import get_current_user
 
 router = APIRouter(prefix="/videos", tags=["動画"])
 
+# S3 のマルチパート制約
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
 
-def get_s3_client():
-    """S3/MinIOクライアントを取得"""
-    return boto3.client(
-        "s3",
-        endpoint_url=f"http://{settings.minio_endpoint}",
-        aws_access_key_id=settings.minio_access_key,
-        aws_secret_access_key=settings.minio_secret_key,
-        config=Config(signature_version="s3v4"),
+
+def _part_size(file_size: int) -> int:
+    """パート数が上限を超えないパートサイズ（MB単位に切り上げ）"""
+    part_size = max(settings.multipart_part_size_mb * 1024 * 1024, MIN_PART_SIZE)
+    if math.ceil(file_size / part_size) > MAX_PARTS:
+        mb = 1024 * 1024
+        part_size = math.ceil(file_size / MAX_PARTS / mb) * mb
+    return part_size
+
+
+def _part_count(file_size: int) -> int:
+    return math.ceil(file_size / _part_size(file_size))
+
+
+async def _get_uploading_video(db: AsyncSession, video_id: UUID, current_user: Principal) -> Video:
+    """アップロード操作の対象動画を取得（所有者チェック込み）"""
+    result = await db.execute(
+        select(Video).options(joinedload(Video.channel)).where(Video.id == video_id)
     )
+    video = result.scalar_one_or_none()
+
+    if not video:
+        raise HTTPException(status_code=404, detail="動画が見つかりません")
+    if not video.channel or video.channel.owner_user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="この動画を操作する権限がありません")
+    if video.status != VideoStatus.UPLOADING:
+        raise HTTPException(status_code=409, detail="この動画はアップロード中ではありません")
+    return video
 
 
 @router.post("/init-upload", response_model=UploadInitResponse)
 async def init_upload(
     video_data: VideoCreate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """アップロード開始：プリサインURLを返す"""
+    """アップロード開始：プリサインURLを返す
+    
+    file_size を指定するとマルチパートアップロードになり、パートごとのURLを返す。
+    クライアントはパートを並列にPUTし、各レスポンスの ETag を complete-upload に渡す。
+    """
     # チャンネル権限チェック
     result = await db.execute(select(Channel).where(Channel.id == video_data.channel_id))
     channel = result.scalar_one_or_none()
@@ -43,6 +78,9 @@ async def init_upload(
     if not channel or channel.owner_user_id != current_user.id:
         raise HTTPException(status_code=403, detail="このチャンネルに動画をアップロードする権限がありません")
     
+    if video_data.file_size is not None and not 0 < video_data.file_size <= settings.max_upload_size_mb * 1024 * 1024:
+        raise HTTPException(status_code=400, detail="ファイルサイズが上限を超えています")
+    
     # 動画レコード作成
     video = Video(
         channel_id=video_data.channel_id,
@@ -56,48 +94,110 @@ async def init_upload(
     await db.refresh(video)
     
     # プリサインURL生成
-    s3 = get_s3_client()
+    # 署名はローカル計算のみ（イベントループをブロックしない）
+    storage = get_storage()
     object_key = f"uploads/{video.id}/original.mp4"
+    video.source_url = object_key
     
-    presigned_url = s3.generate_presigned_url(
-        "put_object",
-        Params={
-            "Bucket": settings.minio_bucket,
-            "Key": object_key,
-            "ContentType": "video/mp4"
-        },
-        ExpiresIn=3600,
-    )
+    if video_data.file_size is None:
+        presigned_url = storage.presign(
+            "PUT", object_key, expires_in=3600, headers={"Content-Type": "video/mp4"}
+        )
+        await db.commit()
+        return UploadInitResponse(video_id=video.id, upload_url=presigned_url)
     
-    # ソースURL保存
-    video.source_url = object_key
+    # マルチパートアップロード
+    try:
+        upload_id = await storage.acreate_multipart_upload(object_key, "video/mp4")
+    except StorageError:
+        raise HTTPException(status_code=502, detail="アップロードの開始に失敗しました")
+    video.upload_id = upload_id
+    video.upload_size = video_data.file_size
     await db.commit()
     
+    part_size = _part_size(video_data.file_size)
+    expires_in = settings.multipart_url_expires_seconds
+    part_urls = [
+        storage.presign_upload_part(object_key, upload_id, number, expires_in=expires_in)
+        for number in range(1, _part_count(video_data.file_size) + 1)
+    ]
     return UploadInitResponse(
         video_id=video.id,
-        upload_url=presigned_url,
+        upload_id=upload_id,
+        part_size=part_size,
+        part_urls=part_urls,
+        expires_in=expires_in,
+    )
+
+
+@router.post("/{video_id}/upload-parts", response_model=UploadPartUrlsResponse)
+async def refresh_upload_part_urls(
+    video_id: UUID,
+    data: UploadPartUrlsRequest,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """パートURLの再発行（中断したアップロードの再開用）"""
+    video = await _get_uploading_video(db, video_id, current_user)
+    if not video.upload_id:
+        raise HTTPException(status_code=400, detail="マルチパートアップロードではありません")
+    # 申告されたサイズを超えるパートは発行しない
+    part_count = _part_count(video.upload_size) if video.upload_size else MAX_PARTS
+    if any(not 1 <= number <= part_count for number in data.part_numbers):
+        raise HTTPException(status_code=400, detail="パート番号が不正です")
+    
+    storage = get_storage()
+    expires_in = settings.multipart_url_expires_seconds
+    return UploadPartUrlsResponse(
+        part_urls={
+            number: storage.presign_upload_part(video.source_url, video.upload_id, number, expires_in=expires_in)
+            for number in data.part_numbers
+        },
+        expires_in=expires_in,
     )
 
 
 @router.post("/complete-upload")
 async def complete_upload(
     data: UploadCompleteRequest,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """アップロード完了：変換ジョブをキューに投入"""
-    result = await db.execute(select(Video).where(Video.id == data.video_id))
-    video = result.scalar_one_or_none()
-    
-    if not video:
-        raise HTTPException(status_code=404, detail="動画が見つかりません")
+    video = await _get_uploading_video(db, data.video_id, current_user)
+    storage = get_storage()
     
-    # 権限チェック
-    channel_result = await db.execute(select(Channel).where(Channel.id == video.channel_id))
-    channel = channel_result.scalar_one_or_none()
+    # マルチパートの場合はパートを結合する
+    if video.upload_id:
+        if not data.parts:
+            raise HTTPException(status_code=400, detail="アップロードしたパートを指定してください")
+        part_count = _part_count(video.upload_size) if video.upload_size else MAX_PARTS
+        if any(not 1 <= part.part_number <= part_count for part in data.parts):
+            raise HTTPException(status_code=400, detail="パート番号が不正です")
+        try:
+            await storage.acomplete_multipart_upload(
+                video.source_url, video.upload_id,
+                [(part.part_number, part.etag) for part in data.parts],
+            )
+        except StorageError:
+            raise HTTPException(status_code=400, detail="パートの結合に失敗しました。未送信のパートを再送してください")
+        # 結合済みのアップロードIDは再試行時に使えないため先に消す
+        video.upload_id = None
+        await db.commit()
     
-    if not channel or channel.owner_user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="この動画を操作する権限がありません")
+    # プリサインURLではサイズを制限できないため、完成したオブジェクトのサイズを確認する
+    try:
+        size = await storage.asize(video.source_url)
+    except StorageError:
+        raise HTTPException(status_code=502, detail="アップロードの確認に失敗しました")
+    if size is None:
+        raise HTTPException(status_code=400, detail="動画ファイルがアップロードされていません")
+    if size > settings.max_upload_size_mb * 1024 * 1024:
+        video.status = VideoStatus.FAILED
+        await db.commit()
+        from ..workers.tasks import delete_media_objects
+        delete_media_objects.delay(video.source_url, f"uploads/{video.id}")
+        raise HTTPException(status_code=400, detail="ファイルサイズが上限を超えています")
     
     # ステータス更新
     video.status = VideoStatus.PROCESSING
@@ -110,15 +210,110 @@ async def complete_upload(
     return {"message": "変換処理を開始しました", "video_id": str(video.id)}
 
 
+async def _count_videos(db: AsyncSession, query, q: str | None) -> int:
+    """一覧の総数を取得（Redisに短時間キャッシュ）"""
+    cache_key = f"videos:total:{hashlib.sha1((q or '').encode()).hexdigest()}"
+    redis = get_redis()
+    cached = await redis.get(cache_key)
+    if cached is not None:
+        return int(cached)
+    
+    count_query = select(func.count()).select_from(query.order_by(None).subquery())
+    total = (await db.execute(count_query)).scalar() or 0
+    await redis.set(cache_key, total, ex=settings.video_total_cache_ttl_seconds)
+    return total
+
+
+async def _videos_by_ids(db: AsyncSession, ids: list[str]) -> list[Video]:
+    """公開中の動画を ids の順で取得（存在しない・非公開の ID は除く）"""
+    if not ids:
+        return []
+    result = await db.execute(
+        select(Video)
+        .options(joinedload(Video.channel))
+        .where(
+            Video.id.in_([UUID(i) for i in ids]),
+            Video.visibility == VideoVisibility.PUBLIC,
+            Video.status == VideoStatus.PUBLISHED,
+        )
+    )
+    by_id = {str(v.id): v for v in result.scalars().all()}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _ranking_offset(rank: ranking.Ranking, page: int, per_page: int, cursor: str | None) -> int | None:
+    """ランキングを読み始める位置（ランキング以外のカーソルが渡された場合は None）"""
+    if not cursor:
+        return (page - 1) * per_page
+    try:
+        name, offset = decode_cursor(cursor, 2)
+    except InvalidCursorError:
+        return None
+    if name != rank.name or not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="カーソルが不正です")
+    return offset
+
+
+async def _ranked_page(
+    db: AsyncSession,
+    rank: ranking.Ranking,
+    offset: int,
+    per_page: int,
+) -> tuple[list[Video], str | None] | None:
+    """ランキングの offset 位置から1ページ分を (動画, next_cursor) で返す
+
+    一覧は保持件数（ranking_size）までで、それより後ろの位置は空のページになる。
+    ランキング未計算・Redis 障害時は None。
+    """
+    if offset >= settings.ranking_size:
+        return [], None
+    try:
+        ids = await ranking.ranked_ids(rank, offset, per_page)
+    except redis.RedisError:
+        return None
+    if ids is None:
+        return None
+    
+    # 集計後に非公開になった動画は除くため、ページが per_page に満たない場合がある
+    videos = await _videos_by_ids(db, ids)
+    next_offset = offset + len(ids)
+    has_next = len(ids) == per_page and next_offset < settings.ranking_size
+    return videos, encode_cursor(rank.name, next_offset) if has_next else None
+
+
 @router.get("", response_model=VideoListResponse)
 async def list_videos(
+    request: Request,
     q: str | None = Query(None, description="検索クエリ"),
-    sort: str = Query("new", description="ソート順: new, popular"),
+    sort: str | None = Query(None, description="ソート順: new, popular, relevance（既定は q 指定時 relevance、それ以外 new）"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=50),
+    cursor: str | None = Query(None, description="前ページの next_cursor（指定時は page を無視）"),
+    with_total: bool = Query(True, description="総数を返すか（キャッシュ値、false で集計を省略）"),
     db: AsyncSession = Depends(get_db)
 ):
     """動画一覧・検索"""
+    # 検索・カーソル指定のない先頭ページのみレスポンスをキャッシュする
+    if q or cursor or sort not in (None, "new", "popular") or page > settings.response_cache_listing_max_page:
+        return await _list_videos(db, q, sort, page, per_page, cursor, with_total)
+    
+    async def build():
+        response = await _list_videos(db, q, sort, page, per_page, cursor, with_total)
+        return response.model_dump_json(), [response_cache.LISTING_TAG]
+    
+    key = f"videos:list:{sort or 'new'}:{page}:{per_page}:{int(with_total)}"
+    return await response_cache.cached_response(request, key, build, settings.response_cache_listing_ttl_seconds)
+
+
+async def _list_videos(
+    db: AsyncSession,
+    q: str | None,
+    sort: str | None,
+    page: int,
+    per_page: int,
+    cursor: str | None,
+    with_total: bool,
+) -> VideoListResponse:
     query = select(Video).where(
         Video.visibility == VideoVisibility.PUBLIC,
         Video.status == VideoStatus.PUBLISHED
@@ -126,73 +321,195 @@ async def list_videos(
     
     # 検索
     if q:
-        search_filter = or_(
-            Video.title.ilike(f"%{q}%"),
-            Video.description.ilike(f"%{q}%"),
+        query = apply_search(query, q)
+    if sort is None:
+        sort = "relevance" if q else "new"
+    
+    # 総数取得
+    total = await _count_videos(db, query, q) if with_total else None
+    
+    # 関連度順（スコアは行ごとに計算されるため offset でページングする）
+    if sort == "relevance" and q:
+        if cursor:
+            raise HTTPException(status_code=400, detail="関連度順ではカーソルを指定できません")
+        query = query.order_by(search_rank(q).desc(), Video.id.desc()).options(joinedload(Video.channel))
+        result = await db.execute(query.offset((page - 1) * per_page).limit(per_page))
+        return VideoListResponse(
+            videos=[VideoResponse.model_validate(v) for v in result.scalars().all()],
+            total=total,
+            page=page,
+            per_page=per_page,
         )
-        query = query.where(search_filter)
     
-    # ソート
-    if sort == "popular":
-        query = query.order_by(Video.view_count.desc())
-    else:
-        query = query.order_by(Video.published_at.desc())
+    # 人気順は事前計算したランキングから取得し、急上昇と同じく保持件数（ranking_size）までの
+    # 一覧とする。順序の異なる view_count 順に続けると重複・欠落が出るため、ランキングの
+    # 末尾からは続けない。ランキング未計算・Redis 障害時のみ view_count 順で返す
+    # （ランキングのカーソルは位置、view_count 順のカーソルはキーセットで、どちらも受け付ける）
+    offset = (page - 1) * per_page
+    if sort == "popular" and not q:
+        ranked_offset = _ranking_offset(ranking.POPULAR, page, per_page, cursor)
+        if ranked_offset is not None:
+            ranked = await _ranked_page(db, ranking.POPULAR, ranked_offset, per_page)
+            if cursor:
+                page = None
+            if ranked is not None:
+                videos, next_cursor = ranked
+                return VideoListResponse(
+                    videos=[VideoResponse.model_validate(v) for v in videos],
+                    total=total,
+                    page=page,
+                    per_page=per_page,
+                    next_cursor=next_cursor,
+                )
+            # ランキングが使えない間は同じ位置から view_count 順で返す（次のページからはキーセット）
+            offset, cursor = ranked_offset, None
     
-    # 総数取得
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
+    # ソート（キーセットページネーション用に id を第2キーにする）
+    sort_column = Video.view_count if sort == "popular" else Video.published_at
+    query = query.order_by(sort_column.desc(), Video.id.desc()).options(joinedload(Video.channel))
     
     # ページネーション
-    query = query.offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
+    if cursor:
+        try:
+            cursor_sort, last_key, last_id = decode_cursor(cursor, 3)
+            if cursor_sort != sort:
+                raise InvalidCursorError(cursor)
+            if sort != "popular":
+                last_key = datetime.fromisoformat(last_key)
+            last_id = UUID(last_id)
+        except (InvalidCursorError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+        query = query.where(tuple_(sort_column, Video.id) < tuple_(last_key, last_id))
+        page = None
+    else:
+        query = query.offset(offset)
+    
+    result = await db.execute(query.limit(per_page))
     videos = result.scalars().all()
     
+    next_cursor = None
+    if len(videos) == per_page:
+        last = videos[-1]
+        last_key = last.view_count if sort == "popular" else last.published_at
+        next_cursor = encode_cursor(sort, last_key, last.id)
+    
     return VideoListResponse(
         videos=[VideoResponse.model_validate(v) for v in videos],
         total=total,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        next_cursor=next_cursor,
     )
 
 
-@router.get("/{video_id}", response_model=VideoResponse)
-async def get_video(
-    video_id: UUID,
+@router.get(":batch", response_model=VideoBatchResponse)
+async def get_videos_batch(
+    ids: str = Query(..., description="カンマ区切りの動画ID"),
     db: AsyncSession = Depends(get_db)
 ):
-    """動画詳細を取得"""
+    """複数の動画をカード表示用の情報でまとめて取得"""
+    try:
+        video_ids = list(dict.fromkeys(UUID(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="動画IDが不正です")
+    if len(video_ids) > settings.video_batch_max_ids:
+        raise HTTPException(status_code=400, detail=f"一度に取得できる動画は{settings.video_batch_max_ids}件までです")
+    
+    # ID 数によらず同じ SQL になるよう配列1つで渡す（プリペアドステートメントを再利用できる）
+    card_columns = [getattr(Video, name) for name in VideoCardResponse.model_fields]
     result = await db.execute(
-        select(Video).where(Video.id == video_id)
+        select(*card_columns).where(
+            Video.id == any_(literal(video_ids, ARRAY(PG_UUID(as_uuid=True)))),
+            Video.visibility != VideoVisibility.PRIVATE,
+        )
     )
-    video = result.scalar_one_or_none()
+    cards = {row.id: VideoCardResponse.model_validate(row) for row in result.all()}
     
-    if not video:
-        raise HTTPException(status_code=404, detail="動画が見つかりません")
+    return VideoBatchResponse(
+        videos=[cards[i] for i in video_ids if i in cards],
+        missing=[i for i in video_ids if i not in cards],
+    )
+
+
+@router.get("/trending", response_model=VideoListResponse)
+async def list_trending_videos(
+    request: Request,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=50),
+    cursor: str | None = Query(None, description="前ページの next_cursor（指定時は page を無視）"),
+    db: AsyncSession = Depends(get_db)
+):
+    """急上昇の動画一覧（直近に公開され、短期間に反応を集めている順）"""
+    async def trending() -> VideoListResponse:
+        # 急上昇は保持件数（ranking_size）までの一覧とする
+        offset = _ranking_offset(ranking.TRENDING, page, per_page, cursor)
+        if offset is None:
+            raise HTTPException(status_code=400, detail="カーソルが不正です")
+        ranked = await _ranked_page(db, ranking.TRENDING, offset, per_page)
+        videos, next_cursor = ranked or ([], None)
+        return VideoListResponse(
+            videos=[VideoResponse.model_validate(v) for v in videos],
+            page=None if cursor else page,
+            per_page=per_page,
+            next_cursor=next_cursor,
+        )
     
-    # 非公開動画のアクセス制限（簡易版）
-    if video.visibility == VideoVisibility.PRIVATE:
-        raise HTTPException(status_code=403, detail="この動画は非公開です")
+    if cursor or page > settings.response_cache_listing_max_page:
+        return await trending()
     
-    return VideoResponse.model_validate(video)
+    async def build():
+        return (await trending()).model_dump_json(), [response_cache.LISTING_TAG]
+    
+    key = f"videos:trending:{page}:{per_page}"
+    return await response_cache.cached_response(request, key, build, settings.response_cache_listing_ttl_seconds)
+
+
+@router.get("/{video_id}", response_model=VideoResponse)
+async def get_video(
+    video_id: UUID,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """動画詳細を取得"""
+    async def build():
+        result = await db.execute(
+            select(Video).options(joinedload(Video.channel)).where(Video.id == video_id)
+        )
+        video = result.scalar_one_or_none()
+        
+        if not video:
+            raise HTTPException(status_code=404, detail="動画が見つかりません")
+        
+        # 非公開動画のアクセス制限（簡易版）
+        if video.visibility == VideoVisibility.PRIVATE:
+            raise HTTPException(status_code=403, detail="この動画は非公開です")
+        
+        tags = [response_cache.video_tag(video_id), response_cache.channel_tag(video.channel_id)]
+        return VideoResponse.model_validate(video).model_dump_json(), tags
+    
+    return await response_cache.cached_response(
+        request, f"video:{video_id}", build, settings.response_cache_ttl_seconds
+    )
 
 
 @router.patch("/{video_id}", response_model=VideoResponse)
 async def update_video(
     video_id: UUID,
     video_data: VideoUpdate,
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """動画を更新"""
-    result = await db.execute(select(Video).where(Video.id == video_id))
+    result = await db.execute(
+        select(Video).options(joinedload(Video.channel)).where(Video.id == video_id)
+    )
     video = result.scalar_one_or_none()
     
     if not video:
         raise HTTPException(status_code=404, detail="動画が見つかりません")
     
     # 権限チェック
-    channel_result = await db.execute(select(Channel).where(Channel.id == video.channel_id))
-    channel = channel_result.scalar_one_or_none()
+    channel = video.channel
     
     if not channel or channel.owner_user_id != current_user.id:
         raise HTTPException(status_code=403, detail="この動画を編集する権限がありません")
@@ -204,30 +521,89 @@ async def update_video(
             value = VideoVisibility(value)
         setattr(video, key, value)
     
-    # 公開に変更した場合
-    if video_data.visibility == "public" and video.status == VideoStatus.READY:
+    # 公開に変更した場合（途中公開で再生可能なものを含む。変換中のものは再生可能になった時点で公開される）
+    if video_data.visibility == "public" and video.status in (VideoStatus.PLAYABLE, VideoStatus.PARTIALLY_READY, VideoStatus.READY):
         video.status = VideoStatus.PUBLISHED
         video.published_at = datetime.utcnow()
     
+    # expire_on_commit=False のため、読み込み済みの channel を含めてそのまま返せる
     await db.commit()
-    await db.refresh(video)
+    await response_cache.invalidate(
+        response_cache.video_tag(video_id), response_cache.channel_tag(video.channel_id), response_cache.LISTING_TAG
+    )
     
     return VideoResponse.model_validate(video)
 
 
-@router.post("/{video_id}/view")
-async def record_view(
+@router.delete("/{video_id}")
+async def delete_video(
     video_id: UUID,
+    current_user: Principal = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """視聴回数をカウント"""
-    result = await db.execute(select(Video).where(Video.id == video_id))
+    """動画を削除（共有メディアは参照がなくなった時点で削除）"""
+    result = await db.execute(
+        select(Video).options(joinedload(Video.channel)).where(Video.id == video_id)
+    )
     video = result.scalar_one_or_none()
     
     if not video:
         raise HTTPException(status_code=404, detail="動画が見つかりません")
+    if not video.channel or video.channel.owner_user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="この動画を削除する権限がありません")
+    
+    if video.upload_id:
+        try:
+            await get_storage().aabort_multipart_upload(video.source_url, video.upload_id)
+        except StorageError:
+            pass  # 残ったパートは定期タスクで破棄される
+    
+    # 関連行は lazy="raise" のため ORM のカスケードを使わずに削除する
+    for model in (Comment, Like, WatchHistory):
+        await db.execute(delete(model).where(model.video_id == video_id))
+    await db.execute(delete(Video).where(Video.id == video_id))
+    
+    # 削除するオブジェクト（None の場合は他の動画が参照中）
+    orphaned = None
+    if video.asset_id:
+        ref = (await db.execute(
+            update(MediaAsset)
+            .where(MediaAsset.id == video.asset_id)
+            .values(ref_count=MediaAsset.ref_count - 1)
+            .returning(MediaAsset.ref_count, MediaAsset.source_key, MediaAsset.storage_prefix)
+        )).first()
+        if ref and ref.ref_count <= 0:
+            await db.execute(delete(MediaAsset).where(MediaAsset.id == video.asset_id))
+            orphaned = (ref.source_key, ref.storage_prefix)
+    else:
+        orphaned = (video.source_url, f"videos/{video.id}")
     
-    video.view_count += 1
     await db.commit()
+    await response_cache.invalidate(
+        response_cache.video_tag(video_id), response_cache.channel_tag(video.channel_id), response_cache.LISTING_TAG
+    )
+    
+    if orphaned:
+        from ..workers.tasks import delete_media_objects
+        delete_media_objects.delay(*orphaned)
+    
+    return {"message": "動画を削除しました"}
+
+
+@router.post("/{video_id}/view")
+async def record_view(
+    video_id: UUID,
+    db: AsyncSession = Depends(get_db)
+):
+    """視聴回数をカウント（バッファに積み、定期タスクでDBへ反映）"""
+    # 行ロックを取らないよう、カウンタ列のみ参照する
+    result = await db.execute(select(Video.view_count).where(Video.id == video_id))
+    row = result.first()
+    
+    if row is None:
+        raise HTTPException(status_code=404, detail="動画が見つかりません")
+    
+    pending = await view_counter.record_view(video_id)
     
-    return {"view_count": video.view_count}
+    # DB反映済みの値 + 未反映分 = おおよその現在値
+    return {"view_count": (row.view_count or 0) + pending}
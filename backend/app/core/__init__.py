@@ -1,2 +1,4 @@
 from .config import settings, get_settings
-from .security import verify_password, get_password_hash, create_access_token, decode_access_token
+from .security import (
+    create_access_token, decode_access_token, password_hasher, PasswordHasherBusyError,
+)
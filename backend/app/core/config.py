@@ -6,6 +6,7 @@ class Settings(BaseSettings):
     # App
     app_name: str = "Video Platform API"
     debug: bool = True
+    sql_echo: bool = False  # 全 SQL を同期的にログ出力する（ローカルでの調査用）
     
     # Database
     database_url: str = "postgresql://postgres:postgres@db:5432/video_platform"
@@ -13,20 +14,99 @@ class Settings(BaseSettings):
     # Redis
     redis_url: str = "redis://redis:6379/0"
     
+    # Storage
+    storage_backend: str = "s3"  # s3 / local
+    local_storage_root: str = "/tmp/video-platform-storage"
+
     # MinIO / S3
     minio_endpoint: str = "minio:9000"
     minio_access_key: str = "minioadmin"
     minio_secret_key: str = "minioadmin"
     minio_bucket: str = "videos"
     minio_use_ssl: bool = False
+    s3_region: str = "us-east-1"
+    s3_max_pool_connections: int = 32  # 共有クライアントのHTTPコネクション数（アップロード並列数以上にする）
     
+    # Worker DB pool（ワーカープロセスごと）
+    worker_db_pool_size: int = 5
+    worker_db_max_overflow: int = 5
+
     # JWT
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 60 * 24  # 24 hours
+    jwt_embed_principal: bool = False  # role/status をトークンに含め、読み取り系でDB参照を省略する
+
+    # Password hashing
+    bcrypt_rounds: int = 12  # 変更するとログイン時に順次再ハッシュされる
+    password_hash_workers: int = 4  # ハッシュ計算の並列数（ワーカープロセスごと）
+    password_hash_queue_size: int = 32  # 並列数を超えて待たせる要求の上限（超過分は 429）
+
+    # Principal cache
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_max_size: int = 10000
     
     # Upload
     max_upload_size_mb: int = 5120  # 5GB
+    multipart_part_size_mb: int = 64  # マルチパートアップロードのパートサイズ（S3 の下限は 5MB）
+    multipart_url_expires_seconds: int = 6 * 3600  # パートアップロードURLの有効期限
+    abandoned_upload_hours: int = 24  # これより古い未完了アップロードは破棄する
+    abandoned_upload_cleanup_interval_seconds: int = 3600
+
+    # Transcode
+    transcode_chunk_seconds: int = 120  # チャンク分割エンコードのチャンク長（HLSセグメント長の倍数に切り上げ）
+    transcode_chunked_min_duration_seconds: int = 900  # これより長い動画はチャンク分割して並列エンコード
+    transcode_source_url_expires_seconds: int = 3 * 3600  # FFmpeg が元動画を読むプリサインURLの有効期限
+    transcode_upload_concurrency: int = 4  # セグメントの同時アップロード数
+    transcode_upload_poll_seconds: float = 0.5  # 完成セグメントの検出間隔
+    transcode_x264_preset: str = "medium"  # x264 のプリセット（ffmpeg の既定と同じ）
+    transcode_cancel_check_seconds: float = 5.0  # 重複排除による変換中断の確認間隔
+    progressive_publish: bool = True  # 最低画質を先に逐次公開し、変換完了前から再生可能にする
+
+    # View counter
+    view_flush_interval_seconds: int = 10  # 視聴回数バッファの反映間隔
+
+    # Watch history
+    watch_history_flush_interval_seconds: int = 5  # 再生位置バッファの反映間隔
+    watch_history_recent_size: int = 100  # ユーザーごとにキャッシュする最近の視聴数
+    watch_history_cache_ttl_days: int = 30
+    watch_history_max_heartbeats: int = 50  # 1リクエストで受け付ける位置更新数
+
+    # Counter reconciliation
+    reconcile_interval_seconds: int = 300
+    reconcile_batch_size: int = 500  # 1トランザクションで補正する動画数
+    reconcile_max_batches: int = 200  # 1回の実行で処理するバッチ数の上限
+    reconcile_lock_timeout_ms: int = 2000  # 補正時の行ロック待ちの上限
+    reconcile_grace_seconds: int = 30  # 直近に更新された動画は次回に回す
+    reconcile_orphaned_flush_seconds: int = 600  # これより古い views:flushing:* / watch:flushing:* は取り残されたとみなす
+
+    # Rankings
+    ranking_refresh_interval_seconds: int = 300
+    ranking_size: int = 10000  # ランキングに保持する動画数
+    ranking_like_weight: float = 20.0  # いいね1件を視聴何回分とみなすか
+    ranking_comment_weight: float = 50.0
+    ranking_popular_half_life_hours: float = 24 * 30
+    ranking_trending_half_life_hours: float = 24
+    ranking_trending_window_days: int = 7
+
+    # Video listing
+    video_total_cache_ttl_seconds: int = 60  # 一覧総数のキャッシュ時間
+    video_batch_max_ids: int = 100  # /videos:batch で一度に取得できる動画数
+    search_short_query_scan_limit: int = 50000  # 3文字未満の検索で部分一致を探す新着の公開動画数
+
+    # Response cache
+    response_cache_ttl_seconds: int = 60  # 動画詳細・チャンネルのレスポンスキャッシュ
+    response_cache_listing_ttl_seconds: int = 10  # 一覧の先頭ページのレスポンスキャッシュ
+    response_cache_listing_max_page: int = 3  # これ以下のページのみキャッシュする
+    response_cache_lock_timeout_seconds: float = 5.0  # 生成中の他リクエストを待つ上限
+    response_cache_generation_ttl_seconds: int = 300  # 無効化した世代を保持する時間（これより長い生成は保存を止められない）
+
+    # SQL profiling
+    slow_query_threshold_ms: float = 200.0  # これ以上かかった SQL をスロークエリとして記録
+    slow_query_sample_rate: float = 1.0  # スロークエリログに出す割合（大量に出る場合に下げる）
+    sql_profile_enabled: bool = False  # X-Profile ヘッダによる SQL タイムラインの取得を許可
+    sql_profile_ttl_seconds: int = 300  # 取得したタイムラインの保持時間
+    sql_profile_max_statements: int = 500  # タイムラインに記録する SQL 数の上限
 
     class Config:
         env_file = ".env"
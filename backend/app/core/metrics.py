@@ -0,0 +1,232 @@
+"""メトリクス
+
+API プロセス内の値（リクエストのレイテンシなど）はメモリ上の Counter / Gauge /
+Histogram に記録し、registry.render() で Prometheus テキスト形式にする。
+値はプロセスごとに独立しているため、複数ワーカーで動かす場合はプロセスごとに収集する。
+
+Celery ワーカーのように複数プロセスで集計したい値は Redis 上の
+累積ヒストグラム・カウンタ（キー metrics:<name>）に記録し、render で
+Prometheus テキスト形式に変換する。
+"""
+import bisect
+import threading
+import redis
+from .redis import get_sync_redis
+
+# レイテンシ用のバケット（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_bucket(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """ラベルの組ごとに値を持つプロセス内メトリクスの基底クラス"""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key: tuple[str, ...], value) -> list[str]:
+        return [f"{self.name}{format_labels(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        # 該当するバケットだけ加算し、累積は出力時に計算する
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key: tuple[str, ...], value) -> list[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = f'le="{format_bucket(bound)}"'
+            lines.append(f"{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {total}")
+        lines.append(f"{self.name}_count{format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    """プロセス内メトリクスの一覧"""
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> list[str]:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return lines
+
+
+registry = Registry()
+
+
+class RedisHistogram:
+    """Redis のハッシュに累積値を保持するヒストグラム（プロセス間で共有）"""
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.key = f"metrics:{name}"
+
+    def observe(self, value: float) -> None:
+        pipe = get_sync_redis().pipeline(transaction=False)
+        for bound in self.buckets:
+            if value <= bound:
+                pipe.hincrby(self.key, f"bucket:{format_bucket(bound)}", 1)
+        pipe.hincrbyfloat(self.key, "sum", value)
+        pipe.hincrby(self.key, "count", 1)
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            # メトリクスの記録失敗で本処理を止めない
+            pass
+
+    def render(self, values: dict[str, str]) -> list[str]:
+        """HGETALL の結果を Prometheus テキスト形式の行にする"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for bound in self.buckets:
+            le = format_bucket(bound)
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {values.get(f"bucket:{le}", 0)}')
+        lines.append(f"{self.name}_sum {values.get('sum', 0)}")
+        lines.append(f"{self.name}_count {values.get('count', 0)}")
+        return lines
+
+
+class RedisCounter:
+    """Redis のハッシュにラベルごとの累積値を保持するカウンタ（プロセス間で共有）"""
+
+    def __init__(self, name: str, help: str, label: str):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.key = f"metrics:{name}"
+
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        try:
+            get_sync_redis().hincrbyfloat(self.key, label_value, amount)
+        except redis.RedisError:
+            pass
+
+    def render(self, values: dict[str, str]) -> list[str]:
+        """HGETALL の結果を Prometheus テキスト形式の行にする"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+# ワーカーのDBコネクションプールからの取得待ち時間
+worker_db_pool_checkout_seconds = RedisHistogram(
+    "worker_db_pool_checkout_seconds",
+    "Time Celery workers wait to check out a database connection from the pool",
+)
+
+# 整合性チェックで補正した非正規化カウンタの差分（絶対値の累計）
+counter_reconcile_drift_total = RedisCounter(
+    "counter_reconcile_drift_total",
+    "Absolute drift corrected by the counter reconciliation job",
+    label="counter",
+)
+
+# /metrics で Redis から読み出して出力するワーカーのメトリクス
+REDIS_METRICS = (worker_db_pool_checkout_seconds, counter_reconcile_drift_total)
+
+# ---------- API プロセス ----------
+
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status",
+    labels=("method", "route", "status"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed",
+))
+http_request_db_statements = registry.register(Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per HTTP request",
+    labels=("route",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+))
+http_request_db_seconds = registry.register(Histogram(
+    "http_request_db_seconds",
+    "Total SQL execution time per HTTP request",
+    labels=("route",),
+))
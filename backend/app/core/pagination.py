@@ -0,0 +1,26 @@
+"""キーセット（カーソル）ページネーション用のカーソル"""
+import base64
+import json
+from typing import Any
+
+
+class InvalidCursorError(ValueError):
+    """カーソルが不正"""
+
+
+def encode_cursor(*values: Any) -> str:
+    """ソートキーの値から不透明なカーソル文字列を生成"""
+    raw = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """カーソル文字列をソートキーの値に戻す"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError(cursor) from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError(cursor)
+    return values
@@ -0,0 +1,108 @@
+"""認証済みユーザー（プリンシパル）の短時間キャッシュ
+
+get_current_user が毎リクエスト users テーブルを引かないよう、
+エンドポイントが実際に使う id / role / status だけをプロセス内の
+TTL付きLRUに保持する。role / status を ORM で変更すると、コミット後に
+自プロセスのエントリを消し、Redis の Pub/Sub で他プロセスにも無効化を通知する
+（Core の UPDATE で変更する場合は publish_invalidation を明示的に呼ぶ）。
+通知を取りこぼした場合（Redis 障害、コミット直前に読んだ行での再キャッシュ）は
+TTL（principal_cache_ttl_seconds）が反映の上限になる。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable
+from uuid import UUID
+import redis
+from .config import settings
+from .redis import get_redis, get_sync_redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "principal:invalidate"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """認証済みユーザー"""
+    id: UUID
+    role: str
+    status: str
+
+
+class PrincipalCache:
+    """TTL付きLRUキャッシュ"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[UUID, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: UUID) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return principal
+
+    def set(self, principal: Principal) -> None:
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.principal_cache_max_size,
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+)
+
+
+def publish_invalidation(user_ids: Iterable[UUID]) -> None:
+    """自プロセスと他プロセスのキャッシュからユーザーを消す"""
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        principal_cache.invalidate(user_id)
+    try:
+        r = get_sync_redis()
+        for user_id in user_ids:
+            r.publish(INVALIDATION_CHANNEL, str(user_id))
+    except redis.RedisError:
+        logger.warning("failed to publish principal invalidation", exc_info=True)
+
+
+async def listen_invalidations() -> None:
+    """他プロセスからの無効化通知を受け取り続ける（APIプロセスの起動時に開始）"""
+    while True:
+        try:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        principal_cache.invalidate(UUID(message["data"]))
+            finally:
+                await pubsub.aclose()
+        except redis.RedisError:
+            # 購読が切れている間の通知は届かないため、キャッシュごと捨てて再接続する
+            logger.warning("principal invalidation subscription lost", exc_info=True)
+            principal_cache.clear()
+            await asyncio.sleep(1)
@@ -0,0 +1,56 @@
+"""事前計算したランキング（人気順・急上昇）
+
+Celery beat の refresh_rankings が公開動画のスコアを計算し、Redis のソート済み
+セット（ranking:<name>）に丸ごと書き出す。API は ZREVRANGE でページ分の ID だけを
+取り出すため、一覧の取得はページサイズに比例するコストで済む。
+
+スコア = (視聴数 + いいね数 × 重み + コメント数 × 重み) × 0.5 ^ (経過時間 / 半減期)
+"""
+from dataclasses import dataclass
+from sqlalchemy import func, literal
+
+from .config import settings
+from .redis import get_redis
+from ..models import Video
+
+
+@dataclass(frozen=True)
+class Ranking:
+    name: str
+    half_life_hours: float
+    window_days: int | None = None  # 対象とする公開日の範囲（None は全期間）
+
+    @property
+    def key(self) -> str:
+        return f"ranking:{self.name}"
+
+
+POPULAR = Ranking("popular", half_life_hours=settings.ranking_popular_half_life_hours)
+TRENDING = Ranking(
+    "trending",
+    half_life_hours=settings.ranking_trending_half_life_hours,
+    window_days=settings.ranking_trending_window_days,
+)
+RANKINGS = (POPULAR, TRENDING)
+
+
+def score_expression(ranking: Ranking):
+    """動画のスコアを計算する SQL 式"""
+    engagement = (
+        func.coalesce(Video.view_count, 0)
+        + func.coalesce(Video.like_count, 0) * settings.ranking_like_weight
+        + func.coalesce(Video.comment_count, 0) * settings.ranking_comment_weight
+    )
+    # published_at は UTC の naive datetime で保存している
+    published_at = func.coalesce(Video.published_at, Video.created_at)
+    age_hours = func.extract("epoch", func.timezone("utc", func.now()) - published_at) / 3600.0
+    return engagement * func.power(literal(0.5), func.greatest(age_hours, 0) / ranking.half_life_hours)
+
+
+async def ranked_ids(ranking: Ranking, offset: int, limit: int) -> list[str] | None:
+    """ランキングの offset 位置から limit 件の動画IDを返す（未計算なら None）"""
+    redis = get_redis()
+    ids = await redis.zrevrange(ranking.key, offset, offset + limit - 1)
+    if not ids and not await redis.exists(ranking.key):
+        return None
+    return ids
@@ -0,0 +1,16 @@
+from functools import lru_cache
+import redis
+import redis.asyncio as aioredis
+from .config import settings
+
+
+@lru_cache()
+def get_redis() -> aioredis.Redis:
+    """非同期Redisクライアントを取得（APIプロセス用）"""
+    return aioredis.from_url(settings.redis_url, decode_responses=True)
+
+
+@lru_cache()
+def get_sync_redis() -> redis.Redis:
+    """同期Redisクライアントを取得（Celeryタスク用）"""
+    return redis.from_url(settings.redis_url, decode_responses=True)
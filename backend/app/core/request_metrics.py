@@ -0,0 +1,88 @@
+"""リクエスト単位の計測
+
+MetricsMiddleware がリクエストごとに RequestStats を contextvar に設定し、
+SQLAlchemy のイベントフック（app/core/sql_profile.py）が実行した SQL の数と時間を加算する。
+レスポンス後にルートテンプレート（/videos/{video_id} など）単位でヒストグラムに記録する。
+
+X-Profile ヘッダ付きのリクエスト（sql_profile_enabled のときのみ）は SQL のタイムラインも
+記録し、X-Profile-Id ヘッダの ID で GET /debug/profiles/{id} から取得できる。
+"""
+import logging
+import time
+import uuid
+
+from .config import settings
+from .metrics import (
+    http_request_duration_seconds, http_requests_in_flight,
+    http_request_db_statements, http_request_db_seconds,
+)
+from .sql_profile import RequestStats, request_stats, save_profile
+
+logger = logging.getLogger(__name__)
+
+# どのルートにも一致しないリクエスト（404 など）のラベル。パスをそのまま使うと系列が増え続ける
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """リクエストのレイテンシ・同時処理数・SQL の数と時間を記録する ASGI ミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: dict | None = None
+
+    def _route(self, scope) -> str:
+        # ルーティング後の scope にはエンドポイント関数が入っている
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        profile_id = None
+        if settings.sql_profile_enabled and any(name == b"x-profile" for name, _ in scope["headers"]):
+            profile_id = uuid.uuid4().hex
+            stats.timeline = []
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile_id is not None:
+                    # ボディを返す時点でエンドポイントの SQL は実行済み（ストリーミングを除く）
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode()),
+                        (b"server-timing", f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries"'.encode()),
+                    ]
+            await send(message)
+
+        token = request_stats.set(stats)
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - stats.started_at
+            http_requests_in_flight.dec()
+            request_stats.reset(token)
+            route = self._route(scope)
+            http_request_duration_seconds.observe(
+                elapsed, method=scope["method"], route=route, status=str(status_code)
+            )
+            http_request_db_statements.observe(stats.statements, route=route)
+            http_request_db_seconds.observe(stats.db_seconds, route=route)
+            if profile_id is not None:
+                try:
+                    await save_profile(profile_id, scope["method"], scope["path"], status_code, stats)
+                except Exception:
+                    logger.warning("failed to save SQL profile %s", profile_id, exc_info=True)
@@ -0,0 +1,214 @@
+"""ホットな読み取りエンドポイントのレスポンスキャッシュ
+
+シリアライズ済みの JSON 本文を Redis に保存し、ETag / If-None-Match による
+304 応答を返す。キャッシュミス時は同一キーの生成を1回にまとめ（プロセス内は
+Future、プロセス間は Redis のロック）、DB への集中を防ぐ。
+エントリはタグ（"video:<id>" など）に紐付け、更新系の処理からタグ単位で無効化する。
+無効化は世代番号を進め、生成開始より後に無効化されたタグを含むエントリは保存しない
+（生成中に無効化された古い内容が TTL まで残るのを防ぐ）。
+Redis が使えない場合はキャッシュせずにそのまま生成する。
+
+いいね・コメント・再生のたびには無効化しないため、キャッシュした動画詳細の
+like_count / comment_count / view_count は最大 TTL（response_cache_ttl_seconds）遅れる。
+書き込みの多い人気動画ほどキャッシュが効かなくなるのを避けるための割り切りで、
+いいね・コメントの API は更新後の件数を応答で返す。
+"""
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, Iterable
+from uuid import uuid4
+import redis
+from fastapi import Request, Response
+
+from .config import settings
+from .redis import get_redis, get_sync_redis
+
+BODY_PREFIX = "cache:body:"
+TAG_PREFIX = "cache:tag:"
+LOCK_PREFIX = "cache:lock:"
+GENERATION_PREFIX = "cache:gen:"
+GENERATION_KEY = "cache:generation"
+
+# ロックの所有者のみ解放する
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# 世代番号を進め、各タグに無効化した世代を記録する
+_INVALIDATE = """
+local generation = redis.call("incr", KEYS[1])
+for i = 2, #KEYS do
+    redis.call("set", KEYS[i], generation, "EX", ARGV[1])
+end
+return generation
+"""
+
+# 生成開始（世代 ARGV[1]）より後に無効化されたタグがなければエントリを保存する
+# KEYS: 本文, (タグの世代, タグ)...
+_STORE = """
+local started = tonumber(ARGV[1])
+for i = 2, #KEYS, 2 do
+    if tonumber(redis.call("get", KEYS[i]) or "0") > started then
+        return 0
+    end
+end
+redis.call("hset", KEYS[1], "etag", ARGV[2], "body", ARGV[3])
+redis.call("expire", KEYS[1], ARGV[4])
+for i = 3, #KEYS, 2 do
+    -- タグはエントリより先に消えないよう、有効期限を延ばす方向にのみ更新する
+    redis.call("sadd", KEYS[i], ARGV[5])
+    redis.call("expire", KEYS[i], ARGV[4], "NX")
+    redis.call("expire", KEYS[i], ARGV[4], "GT")
+end
+return 1
+"""
+
+# 生成関数は (JSON本文, タグ) を返す
+Builder = Callable[[], Awaitable[tuple[str, Iterable[str]]]]
+
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def video_tag(video_id) -> str:
+    return f"video:{video_id}"
+
+
+def channel_tag(channel_id) -> str:
+    return f"channel:{channel_id}"
+
+
+LISTING_TAG = "videos:list"
+
+
+def _etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _response(request: Request, body: str, etag: str) -> Response:
+    # 毎回再検証させ、変更がなければ 304 で本文の転送を省く
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def _load(key: str) -> tuple[str, str] | None:
+    etag, body = await get_redis().hmget(BODY_PREFIX + key, "etag", "body")
+    if body is None:
+        return None
+    return body, etag
+
+
+async def _store(key: str, body: str, etag: str, ttl: int, tags: Iterable[str], generation: int) -> bool:
+    """generation 以降に無効化されたタグがなければ保存する（保存したかを返す）"""
+    keys = [BODY_PREFIX + key]
+    for tag in tags:
+        keys += [GENERATION_PREFIX + tag, TAG_PREFIX + tag]
+    return bool(await get_redis().eval(_STORE, len(keys), *keys, generation, etag, body, ttl, key))
+
+
+async def _fill(key: str, build: Builder, ttl: int) -> tuple[str, str]:
+    """キャッシュを生成する（他プロセスが生成中ならその結果を待つ）"""
+    r = get_redis()
+    lock_key = LOCK_PREFIX + key
+    token = uuid4().hex
+    lock_timeout = settings.response_cache_lock_timeout_seconds
+
+    if await r.set(lock_key, token, nx=True, px=int(lock_timeout * 1000)):
+        try:
+            # 生成中に無効化された場合は保存しない（本文はこのリクエストにだけ返す）
+            generation = int(await r.get(GENERATION_KEY) or 0)
+            body, tags = await build()
+            etag = _etag(body)
+            await _store(key, body, etag, ttl, tags, generation)
+            return body, etag
+        finally:
+            await r.eval(_RELEASE_LOCK, 1, lock_key, token)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        cached = await _load(key)
+        if cached:
+            return cached
+        if not await r.exists(lock_key):
+            break  # 生成側が失敗した（404 など）
+
+    body, _ = await build()
+    return body, _etag(body)
+
+
+async def cached_response(request: Request, key: str, build: Builder, ttl: int) -> Response:
+    """キャッシュ済みの本文を返し、なければ build で生成してキャッシュする"""
+    try:
+        cached = await _load(key)
+    except redis.RedisError:
+        body, _ = await build()
+        return _response(request, body, _etag(body))
+    if cached:
+        return _response(request, *cached)
+
+    # 同じプロセス内の同時リクエストは1つの生成結果を共有する
+    future = _inflight.get(key)
+    if future is not None:
+        body, etag = await asyncio.shield(future)
+        return _response(request, body, etag)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        try:
+            body, etag = await _fill(key, build, ttl)
+        except redis.RedisError:
+            body, _ = await build()
+            etag = _etag(body)
+        future.set_result((body, etag))
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # 待ち手がいない場合の警告を抑止
+        raise
+    finally:
+        del _inflight[key]
+    return _response(request, body, etag)
+
+
+def _generation_keys(tags: Iterable[str]) -> list[str]:
+    return [GENERATION_KEY, *(GENERATION_PREFIX + tag for tag in tags)]
+
+
+async def invalidate(*tags: str) -> None:
+    """タグに紐付くキャッシュを削除"""
+    r = get_redis()
+    try:
+        keys = _generation_keys(tags)
+        await r.eval(_INVALIDATE, len(keys), *keys, settings.response_cache_generation_ttl_seconds)
+        for tag in tags:
+            keys = await r.smembers(TAG_PREFIX + tag)
+            await r.delete(TAG_PREFIX + tag, *(BODY_PREFIX + key for key in keys))
+    except redis.RedisError:
+        pass  # TTL で失効するのを待つ
+
+
+def invalidate_sync(*tags: str) -> None:
+    """タグに紐付くキャッシュを削除（Celeryタスク用）"""
+    r = get_sync_redis()
+    try:
+        keys = _generation_keys(tags)
+        r.eval(_INVALIDATE, len(keys), *keys, settings.response_cache_generation_ttl_seconds)
+        for tag in tags:
+            keys = r.smembers(TAG_PREFIX + tag)
+            r.delete(TAG_PREFIX + tag, *(BODY_PREFIX + key for key in keys))
+    except redis.RedisError:
+        pass
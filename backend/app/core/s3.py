@@ -0,0 +1,38 @@
+import threading
+import boto3
+from botocore.config import Config
+from .config import settings
+
+_client = None
+_lock = threading.Lock()
+
+
+def url_scheme(use_ssl: bool) -> str:
+    return "https" if use_ssl else "http"
+
+
+def get_s3_client():
+    """S3/MinIOクライアントを取得（プロセス内で共有、スレッドセーフ）"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = boto3.client(
+                    "s3",
+                    endpoint_url=f"{url_scheme(settings.minio_use_ssl)}://{settings.minio_endpoint}",
+                    aws_access_key_id=settings.minio_access_key,
+                    aws_secret_access_key=settings.minio_secret_key,
+                    config=Config(
+                        signature_version="s3v4",
+                        max_pool_connections=settings.s3_max_pool_connections,
+                        retries={"max_attempts": 5, "mode": "adaptive"},
+                    ),
+                )
+    return _client
+
+
+def reset_s3_client() -> None:
+    """クライアントを破棄（fork した子プロセスで親の接続を使わないため）"""
+    global _client
+    with _lock:
+        _client = None
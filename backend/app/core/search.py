@@ -0,0 +1,56 @@
+"""動画の全文検索クエリビルダー
+
+search_vector（title / tags / description を重み付けした tsvector、
+トリガーで維持）による全文検索と、pg_trgm の GIN インデックスが効く
+部分一致を組み合わせる。空白で区切られない日本語タイトルは
+tsvector ではトークン化できないため、トライグラム側で拾う。
+トライグラムを取り出せない短いクエリ（3文字未満）は GIN インデックスが効かず
+全件走査になるため、全文検索と、新しい順に search_short_query_scan_limit 件の
+公開動画のタイトルに対する部分一致を組み合わせる（それより古い動画はタイトル・
+タグの単語単位でのみ一致する）。
+"""
+from sqlalchemy import Select, or_, func, select, union
+from ..models import Video, VideoVisibility, VideoStatus
+from .config import settings
+
+# 日本語向けのテキスト検索設定は標準では無いため simple を使う
+SEARCH_CONFIG = "simple"
+
+# これより短いクエリは部分一致（pg_trgm）を使わない
+MIN_TRIGRAM_QUERY_LENGTH = 3
+
+
+def escape_like(value: str) -> str:
+    """LIKE のワイルドカードをエスケープ"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_rank(q: str):
+    """検索スコア（全文検索のランク + タイトルの類似度）"""
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    return func.ts_rank_cd(Video.search_vector, tsquery) + func.similarity(Video.title, q)
+
+
+def apply_search(query: Select, q: str) -> Select:
+    """検索条件を付与"""
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    pattern = f"%{escape_like(q)}%"
+    if len(q.strip()) < MIN_TRIGRAM_QUERY_LENGTH:
+        # 部分一致は公開一覧のインデックスで新着から一定件数だけ走査する
+        recent = (
+            select(Video.id, Video.title)
+            .where(Video.visibility == VideoVisibility.PUBLIC, Video.status == VideoStatus.PUBLISHED)
+            .order_by(Video.published_at.desc(), Video.id.desc())
+            .limit(settings.search_short_query_scan_limit)
+            .subquery()
+        )
+        matched = union(
+            select(Video.id).where(Video.search_vector.op("@@")(tsquery)),
+            select(recent.c.id).where(recent.c.title.ilike(pattern, escape="\\")),
+        )
+        return query.where(Video.id.in_(matched))
+    return query.where(or_(
+        Video.search_vector.op("@@")(tsquery),
+        Video.title.ilike(pattern, escape="\\"),
+        Video.description.ilike(pattern, escape="\\"),
+    ))
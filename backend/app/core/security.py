@@ -1,20 +1,54 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Any
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# rounds を変更すると、既存のハッシュはログイン時に新しいコストで再ハッシュされる
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """パスワードを検証"""
-    return pwd_context.verify(plain_password, hashed_password)
+class PasswordHasherBusyError(Exception):
+    """ハッシュ計算の待ち行列が満杯"""
 
 
-def get_password_hash(password: str) -> str:
-    """パスワードをハッシュ化"""
-    return pwd_context.hash(password)
+class PasswordHasher:
+    """bcrypt の計算を専用スレッドプールで行い、イベントループをブロックしない
+
+    bcrypt は計算中に GIL を解放するため、スレッドで並列に実行できる。
+    実行中と待機中の合計が max_workers + max_queue を超える要求は
+    PasswordHasherBusyError で即座に拒否する（呼び出し側で 429 にする）。
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.limit = max_workers + max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.limit:
+                raise PasswordHasherBusyError()
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """パスワードを検証し、コストが古ければ新しいハッシュも返す"""
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_queue_size)
 
 
 def create_access_token(data: dict[str, Any], expires_delta: timedelta | None = None) -> str:
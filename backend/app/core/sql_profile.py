@@ -0,0 +1,143 @@
+"""SQL のプロファイリング
+
+エンジンの before/after_cursor_execute で SQL ごとの所要時間と行数を取り、
+- リクエスト単位の集計（SQL 数・DB 時間）
+- 閾値を超えた SQL のスロークエリログ（サンプリング・パラメータは型のみ）
+- X-Profile ヘッダ付きリクエストの SQL タイムライン
+に記録する。SQL はリテラルやプレースホルダを ? に置き換えたフィンガープリントで
+まとめるため、同じ形の SQL が繰り返される N+1 がタイムライン上で分かる。
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+
+from .config import settings
+from .redis import get_redis
+
+logger = logging.getLogger("app.sql.slow")
+
+PROFILE_KEY_PREFIX = "profile:"
+
+
+@dataclass
+class RequestStats:
+    """リクエスト中に実行した SQL の集計（timeline はプロファイル時のみ）"""
+    statements: int = 0
+    db_seconds: float = 0.0
+    started_at: float = field(default_factory=time.perf_counter)
+    timeline: list[dict] | None = None
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"\$\d+(?:::[\w\[\]]+)?|%\(\w+\)s|%s|\?")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES = re.compile(r"(VALUES\s*\(\?\))(?:\s*,\s*\(\?\))+", re.I)
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """値の違いを除いた SQL の形（IN や VALUES の要素数の違いもまとめる）"""
+    text = _COMMENT.sub(" ", statement)
+    text = _STRING.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _LIST.sub("(?)", text)
+    text = _VALUES.sub(r"\1", text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def fingerprint_id(fingerprint: str) -> str:
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+
+
+def redact(parameters, executemany: bool = False):
+    """ログ用にパラメータの値を型名に置き換える"""
+    if executemany:
+        return f"<{len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, "_query_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    rows = cursor.rowcount
+
+    stats = request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        if stats.timeline is not None and len(stats.timeline) < settings.sql_profile_max_statements:
+            stats.timeline.append({
+                "offset_ms": round((started_at - stats.started_at) * 1000, 3),
+                "duration_ms": round(elapsed * 1000, 3),
+                "rows": rows,
+                "fingerprint": fingerprint(statement),
+            })
+
+    if elapsed * 1000 >= settings.slow_query_threshold_ms and random.random() < settings.slow_query_sample_rate:
+        normalized = fingerprint(statement)
+        logger.warning(
+            "slow query %.1fms rows=%s fingerprint=%s sql=%s params=%s",
+            elapsed * 1000, rows, fingerprint_id(normalized), normalized, redact(parameters, executemany),
+        )
+
+
+def instrument_engine(sync_engine) -> None:
+    """エンジンに計測用のイベントフックを登録（非同期エンジンは sync_engine を渡す）"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def summarize(timeline: list[dict]) -> list[dict]:
+    """フィンガープリントごとの回数・合計時間（回数の多い順）"""
+    groups: dict[str, dict] = {}
+    for entry in timeline:
+        group = groups.setdefault(entry["fingerprint"], {
+            "fingerprint_id": fingerprint_id(entry["fingerprint"]),
+            "fingerprint": entry["fingerprint"],
+            "count": 0,
+            "total_ms": 0.0,
+        })
+        group["count"] += 1
+        group["total_ms"] = round(group["total_ms"] + entry["duration_ms"], 3)
+    return sorted(groups.values(), key=lambda group: (-group["count"], -group["total_ms"]))
+
+
+async def save_profile(profile_id: str, method: str, path: str, status_code: int, stats: RequestStats) -> None:
+    """リクエストの SQL タイムラインを Redis に保存（GET /debug/profiles/{id} で取得）"""
+    profile = {
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "statements": stats.statements,
+        "db_ms": round(stats.db_seconds * 1000, 3),
+        "truncated": stats.statements > len(stats.timeline),
+        "by_fingerprint": summarize(stats.timeline),
+        "timeline": stats.timeline,
+    }
+    await get_redis().set(PROFILE_KEY_PREFIX + profile_id, json.dumps(profile), ex=settings.sql_profile_ttl_seconds)
+
+
+async def load_profile(profile_id: str) -> dict | None:
+    raw = await get_redis().get(PROFILE_KEY_PREFIX + profile_id)
+    return json.loads(raw) if raw else None
@@ -0,0 +1,407 @@
+"""オブジェクトストレージ
+
+S3Storage はプリサインURLを CPU のみで生成し（SigV4、日付ごとの署名鍵を
+キャッシュ）、API プロセスからの操作は httpx の非同期クライアントで行う。
+Celery ワーカーからの同期操作は共有の boto3 クライアントを使う。
+LocalStorage はローカルファイルシステムに保存し、MinIO なしで動かすためのもの。
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import shutil
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Iterator
+from urllib.parse import quote
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+import httpx
+
+from .config import settings
+from .s3 import get_s3_client, url_scheme
+
+
+class StorageError(Exception):
+    """ストレージ操作の失敗"""
+
+
+def _quote(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _xml_text(body: bytes, tag: str) -> str | None:
+    """S3 の XML レスポンスから要素の値を取り出す（名前空間は無視）"""
+    for element in ElementTree.fromstring(body).iter():
+        if element.tag.rsplit("}", 1)[-1] == tag:
+            return element.text
+    return None
+
+
+class S3Storage:
+    """S3 / MinIO"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        use_ssl: bool = False,
+    ):
+        self.scheme = url_scheme(use_ssl)
+        self.host = endpoint
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self._async_client: httpx.AsyncClient | None = None
+
+    # ---------- 署名 ----------
+
+    @lru_cache(maxsize=4)
+    def _signing_key(self, datestamp: str) -> bytes:
+        """日付単位で変わる署名鍵（同じ日付の間は再計算しない）"""
+        key = f"AWS4{self.secret_key}".encode()
+        for part in (datestamp, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    def _path(self, key: str) -> str:
+        # MinIO 互換のためパススタイルを使う
+        return f"/{self.bucket}/{_quote(key, safe='/-_.~')}"
+
+    def presign(
+        self,
+        method: str,
+        key: str,
+        expires_in: int = 3600,
+        params: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> str:
+        """SigV4 のクエリ署名付きURLを生成
+
+        headers を指定した場合、リクエスト時に同じ値のヘッダーが必要になる。
+        """
+        now = datetime.utcnow()
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = now.strftime("%Y%m%d")
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+
+        signed_headers = {"host": self.host}
+        signed_headers.update({k.lower(): v.strip() for k, v in (headers or {}).items()})
+        header_names = ";".join(sorted(signed_headers))
+
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": header_names,
+            **(params or {}),
+        }
+        canonical_query = "&".join(f"{_quote(k)}={_quote(v)}" for k, v in sorted(query.items()))
+        canonical_headers = "".join(f"{k}:{signed_headers[k]}\n" for k in sorted(signed_headers))
+        canonical_request = "\n".join([
+            method, self._path(key), canonical_query, canonical_headers, header_names, "UNSIGNED-PAYLOAD",
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(self._signing_key(datestamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{self.scheme}://{self.host}{self._path(key)}?{canonical_query}&X-Amz-Signature={signature}"
+
+    def public_url(self, key: str) -> str:
+        return f"{self.scheme}://{self.host}{self._path(key)}"
+
+    # ---------- 非同期操作（APIプロセス用） ----------
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_connections=settings.s3_max_pool_connections),
+            )
+        return self._async_client
+
+    async def _request(self, method: str, key: str, **kwargs) -> httpx.Response:
+        headers = kwargs.pop("headers", None)
+        params = kwargs.pop("params", None)
+        url = self.presign(method, key, expires_in=60, params=params, headers=headers)
+        response = await self.async_client.request(method, url, headers=headers, **kwargs)
+        return response
+
+    async def aput(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        response = await self._request("PUT", key, content=data, headers={"content-type": content_type})
+        if response.status_code >= 300:
+            raise StorageError(f"PUT {key} failed: {response.status_code} {response.text}")
+
+    async def aget(self, key: str) -> bytes:
+        response = await self._request("GET", key)
+        if response.status_code >= 300:
+            raise StorageError(f"GET {key} failed: {response.status_code} {response.text}")
+        return response.content
+
+    async def aexists(self, key: str) -> bool:
+        response = await self._request("HEAD", key)
+        return response.status_code == 200
+
+    async def asize(self, key: str) -> int | None:
+        """オブジェクトのサイズ（存在しなければ None）"""
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 300:
+            raise StorageError(f"HEAD {key} failed: {response.status_code}")
+        return int(response.headers["content-length"])
+
+    async def adelete(self, key: str) -> None:
+        response = await self._request("DELETE", key)
+        if response.status_code >= 300 and response.status_code != 404:
+            raise StorageError(f"DELETE {key} failed: {response.status_code} {response.text}")
+
+    # ---------- マルチパートアップロード ----------
+
+    async def acreate_multipart_upload(self, key: str, content_type: str) -> str:
+        """マルチパートアップロードを開始し、アップロードIDを返す"""
+        response = await self._request("POST", key, params={"uploads": ""}, headers={"content-type": content_type})
+        if response.status_code >= 300:
+            raise StorageError(f"CreateMultipartUpload {key} failed: {response.status_code} {response.text}")
+        return _xml_text(response.content, "UploadId")
+
+    def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires_in: int = 3600) -> str:
+        """パートアップロード用のプリサインURL"""
+        return self.presign(
+            "PUT", key, expires_in=expires_in,
+            params={"partNumber": str(part_number), "uploadId": upload_id},
+        )
+
+    async def acomplete_multipart_upload(self, key: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+        """パートを結合してオブジェクトを完成させる"""
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{escape(etag)}</ETag></Part>"
+            for number, etag in sorted(parts)
+        ) + "</CompleteMultipartUpload>"
+        response = await self._request(
+            "POST", key, params={"uploadId": upload_id}, content=body.encode(),
+            timeout=httpx.Timeout(300.0),
+        )
+        # 結合中のエラーは 200 のボディで返ることがある
+        if response.status_code >= 300 or _xml_text(response.content, "Code") is not None:
+            raise StorageError(f"CompleteMultipartUpload {key} failed: {response.status_code} {response.text}")
+
+    async def aabort_multipart_upload(self, key: str, upload_id: str) -> None:
+        response = await self._request("DELETE", key, params={"uploadId": upload_id})
+        if response.status_code >= 300 and response.status_code != 404:
+            raise StorageError(f"AbortMultipartUpload {key} failed: {response.status_code} {response.text}")
+
+    def list_multipart_uploads(self, prefix: str) -> list[dict]:
+        """未完了のマルチパートアップロード一覧（key, upload_id, initiated）"""
+        uploads = []
+        paginator = get_s3_client().get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for upload in page.get("Uploads", []):
+                uploads.append({
+                    "key": upload["Key"],
+                    "upload_id": upload["UploadId"],
+                    "initiated": upload["Initiated"].replace(tzinfo=None),
+                })
+        return uploads
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        get_s3_client().abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    # ---------- 同期操作（Celeryワーカー用） ----------
+
+    def upload_file(self, path: str, key: str, content_type: str, cache_control: str | None = None) -> None:
+        extra = {"ContentType": content_type}
+        if cache_control:
+            extra["CacheControl"] = cache_control
+        get_s3_client().upload_file(path, self.bucket, key, ExtraArgs=extra)
+
+    def put(self, key: str, data: bytes, content_type: str, cache_control: str | None = None) -> None:
+        extra = {"CacheControl": cache_control} if cache_control else {}
+        get_s3_client().put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type, **extra)
+
+    def get(self, key: str) -> bytes:
+        return get_s3_client().get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def delete(self, key: str) -> None:
+        get_s3_client().delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_chunks(self, key: str, chunk_size: int = 8 * 1024 * 1024) -> Iterator[bytes]:
+        """オブジェクトをメモリに載せずに順に読む"""
+        body = get_s3_client().get_object(Bucket=self.bucket, Key=key)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def delete_prefix(self, prefix: str) -> int:
+        """プレフィックス配下のオブジェクトをまとめて削除し、削除数を返す"""
+        client = get_s3_client()
+        deleted = 0
+        paginator = client.get_paginator("list_objects_v2")
+        # 1ページ最大1000件 = DeleteObjects の上限
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix.rstrip("/") + "/"):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if objects:
+                client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True})
+                deleted += len(objects)
+        return deleted
+
+
+class LocalStorage:
+    """ローカルファイルシステム（開発・テスト・ベンチマーク用）
+
+    プリサインURLは file:// URL を返す（FFmpeg はそのまま読み込める）。
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _file(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise StorageError(f"invalid key: {key}")
+        return path
+
+    def presign(self, method: str, key: str, expires_in: int = 3600, params=None, headers=None) -> str:
+        return f"file://{self._file(key)}"
+
+    def public_url(self, key: str) -> str:
+        return f"file://{self._file(key)}"
+
+    def upload_file(self, path: str, key: str, content_type: str, cache_control: str | None = None) -> None:
+        dest = self._file(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(path, dest)
+
+    def put(self, key: str, data: bytes, content_type: str = "", cache_control: str | None = None) -> None:
+        dest = self._file(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._file(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError as e:
+            raise StorageError(f"not found: {key}") from e
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._file(key))
+
+    def size(self, key: str) -> int | None:
+        try:
+            return os.path.getsize(self._file(key))
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_chunks(self, key: str, chunk_size: int = 8 * 1024 * 1024) -> Iterator[bytes]:
+        try:
+            f = open(self._file(key), "rb")
+        except FileNotFoundError as e:
+            raise StorageError(f"not found: {key}") from e
+        with f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def delete_prefix(self, prefix: str) -> int:
+        path = self._file(prefix.rstrip("/"))
+        if not os.path.isdir(path):
+            return 0
+        deleted = sum(len(files) for _, _, files in os.walk(path))
+        shutil.rmtree(path)
+        return deleted
+
+    def _multipart_dir(self, upload_id: str) -> str:
+        return self._file(f".multipart/{upload_id}")
+
+    def create_multipart_upload(self, key: str, content_type: str = "") -> str:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._multipart_dir(upload_id))
+        with open(os.path.join(self._multipart_dir(upload_id), "key"), "w") as f:
+            f.write(key)
+        return upload_id
+
+    def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires_in: int = 3600) -> str:
+        return f"file://{os.path.join(self._multipart_dir(upload_id), f'{part_number:05d}.part')}"
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+        upload_dir = self._multipart_dir(upload_id)
+        dest = self._file(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            with open(dest, "wb") as out:
+                for number, _ in sorted(parts):
+                    with open(os.path.join(upload_dir, f"{number:05d}.part"), "rb") as part:
+                        shutil.copyfileobj(part, out)
+        except FileNotFoundError as e:
+            raise StorageError(f"missing part for {key}") from e
+        shutil.rmtree(upload_dir)
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+
+    def list_multipart_uploads(self, prefix: str) -> list[dict]:
+        root = self._file(".multipart")
+        uploads = []
+        for upload_id in os.listdir(root) if os.path.isdir(root) else []:
+            with open(os.path.join(root, upload_id, "key")) as f:
+                key = f.read()
+            if key.startswith(prefix):
+                initiated = datetime.utcfromtimestamp(os.path.getmtime(os.path.join(root, upload_id)))
+                uploads.append({"key": key, "upload_id": upload_id, "initiated": initiated})
+        return uploads
+
+    async def aput(self, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
+        await asyncio.to_thread(self.put, key, data, content_type)
+
+    async def aget(self, key: str) -> bytes:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aexists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.exists, key)
+
+    async def asize(self, key: str) -> int | None:
+        return await asyncio.to_thread(self.size, key)
+
+    async def adelete(self, key: str) -> None:
+        await asyncio.to_thread(self.delete, key)
+
+    async def acreate_multipart_upload(self, key: str, content_type: str) -> str:
+        return await asyncio.to_thread(self.create_multipart_upload, key, content_type)
+
+    async def acomplete_multipart_upload(self, key: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+        await asyncio.to_thread(self.complete_multipart_upload, key, upload_id, parts)
+
+    async def aabort_multipart_upload(self, key: str, upload_id: str) -> None:
+        await asyncio.to_thread(self.abort_multipart_upload, key, upload_id)
+
+
+@lru_cache()
+def get_storage() -> S3Storage | LocalStorage:
+    """設定に応じたストレージを取得"""
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.local_storage_root)
+    return S3Storage(
+        endpoint=settings.minio_endpoint,
+        bucket=settings.minio_bucket,
+        access_key=settings.minio_access_key,
+        secret_key=settings.minio_secret_key,
+        region=settings.s3_region,
+        use_ssl=settings.minio_use_ssl,
+    )
@@ -0,0 +1,15 @@
+"""視聴回数のライトビハインドバッファ
+
+視聴イベントは Redis のハッシュに積み上げ、Celery beat の
+flush_view_counts タスクがまとめて videos.view_count に反映する。
+"""
+from uuid import UUID
+from .redis import get_redis
+
+PENDING_KEY = "views:pending"
+FLUSHING_KEY_PREFIX = "views:flushing:"
+
+
+async def record_view(video_id: UUID) -> int:
+    """視聴を1件バッファに積み、未反映の視聴数を返す"""
+    return await get_redis().hincrby(PENDING_KEY, str(video_id), 1)
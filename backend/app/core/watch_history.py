@@ -0,0 +1,110 @@
+"""視聴位置のライトビハインドバッファ
+
+プレイヤーのハートビートは Redis 上で (ユーザー, 動画) ごとに最新の位置だけを残し、
+Celery beat の flush_watch_history タスクがまとめて watch_history に upsert する。
+「続きから見る」用に、ユーザーごとの最近の視聴（ソート済みセット）と位置も
+Redis に保持し、読み取りは DB を経由せずに返す。キャッシュは DB の履歴で埋めた
+ことを示すマーカー（watch:filled:<user>）がある間だけ正とし、無ければ DB から
+埋め直す（ハートビートで作られた、直近の視聴だけの部分的なセットを正としない）。
+"""
+import time
+from uuid import UUID
+from .config import settings
+from .redis import get_redis
+
+PENDING_KEY = "watch:pending"
+FLUSHING_KEY_PREFIX = "watch:flushing:"
+
+
+def recent_key(user_id: UUID) -> str:
+    return f"watch:recent:{user_id}"
+
+
+def positions_key(user_id: UUID) -> str:
+    return f"watch:positions:{user_id}"
+
+
+def filled_key(user_id: UUID) -> str:
+    return f"watch:filled:{user_id}"
+
+
+# DB の履歴をキャッシュにマージする（キャッシュ側の方が新しい動画は上書きしない）
+# KEYS: recent, positions, filled / ARGV: ttl, recent_size, (video_id, entry, watched_at)...
+_FILL_RECENT = """
+for i = 3, #ARGV, 3 do
+    local current = redis.call("hget", KEYS[2], ARGV[i])
+    local cached_at = current and tonumber(string.sub(current, string.find(current, "|", 1, true) + 1))
+    if not cached_at or cached_at < tonumber(ARGV[i + 2]) then
+        redis.call("hset", KEYS[2], ARGV[i], ARGV[i + 1])
+        redis.call("zadd", KEYS[1], ARGV[i + 2], ARGV[i])
+    end
+end
+redis.call("set", KEYS[3], 1, "EX", ARGV[1])
+if redis.call("exists", KEYS[1]) == 1 then
+    redis.call("zremrangebyrank", KEYS[1], 0, -tonumber(ARGV[2]) - 1)
+    redis.call("expire", KEYS[1], ARGV[1])
+    redis.call("expire", KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+
+def encode_entry(position_sec: int, watched_at: float) -> str:
+    return f"{position_sec}|{watched_at}"
+
+
+def decode_entry(value: str) -> tuple[int, float]:
+    position_sec, watched_at = value.split("|")
+    return int(position_sec), float(watched_at)
+
+
+async def record_heartbeats(user_id: UUID, positions: dict[UUID, int]) -> None:
+    """動画ごとの最新の再生位置を記録（同じ動画の古い値は上書きされる）"""
+    now = time.time()
+    ttl = settings.watch_history_cache_ttl_days * 86400
+    pipe = get_redis().pipeline(transaction=False)
+    for video_id, position_sec in positions.items():
+        entry = encode_entry(position_sec, now)
+        pipe.hset(PENDING_KEY, f"{user_id}:{video_id}", entry)
+        pipe.hset(positions_key(user_id), str(video_id), entry)
+        pipe.zadd(recent_key(user_id), {str(video_id): now})
+    # 最近の視聴は上限件数のみ保持する
+    pipe.zremrangebyrank(recent_key(user_id), 0, -settings.watch_history_recent_size - 1)
+    pipe.expire(recent_key(user_id), ttl)
+    pipe.expire(positions_key(user_id), ttl)
+    # マーカーは埋め直し済みの場合のみ延長する（無ければ次の読み取りで DB から埋める）
+    pipe.expire(filled_key(user_id), ttl)
+    await pipe.execute()
+
+
+async def get_recent(user_id: UUID, limit: int) -> list[tuple[str, int, float]] | None:
+    """最近視聴した動画を (動画ID, 再生位置, 視聴時刻) の新しい順で返す（DB から埋めていなければ None）"""
+    redis = get_redis()
+    pipe = redis.pipeline(transaction=False)
+    pipe.exists(filled_key(user_id))
+    pipe.zrevrange(recent_key(user_id), 0, limit - 1)
+    filled, video_ids = await pipe.execute()
+    if not filled:
+        return None
+    if not video_ids:
+        return []
+    entries = await redis.hmget(positions_key(user_id), video_ids)
+    recent = []
+    for video_id, entry in zip(video_ids, entries):
+        if entry is not None:
+            recent.append((video_id, *decode_entry(entry)))
+    return recent
+
+
+async def fill_recent(user_id: UUID, rows: list[tuple[str, int, float]]) -> None:
+    """DB から読んだ視聴履歴をキャッシュにマージし、埋め直し済みにする
+
+    DB 未反映のハートビートの方が新しいため、キャッシュにある動画は視聴時刻が新しい方を残す。
+    """
+    ttl = settings.watch_history_cache_ttl_days * 86400
+    args = [ttl, settings.watch_history_recent_size]
+    for video_id, position_sec, watched_at in rows:
+        args += [video_id, encode_entry(position_sec, watched_at), watched_at]
+    await get_redis().eval(
+        _FILL_RECENT, 3, recent_key(user_id), positions_key(user_id), filled_key(user_id), *args
+    )
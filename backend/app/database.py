@@ -1,12 +1,16 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from .core.config import settings
+from .core.sql_profile import instrument_engine
 
 # 非同期エンジン作成
 engine = create_async_engine(
     settings.database_url.replace("postgresql://", "postgresql+asyncpg://"),
-    echo=settings.debug,
+    echo=settings.sql_echo,
 )
+# SQL の計測（リクエスト単位の集計・スロークエリログ・プロファイル）
+instrument_engine(engine.sync_engine)
+
 
 # セッションファクトリ
 async_session_maker = async_sessionmaker(
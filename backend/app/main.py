@@ -1,7 +1,14 @@
-from fastapi import FastAPI
+import asyncio
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from .core.config import settings
+from .core.metrics import registry, REDIS_METRICS
+from .core.redis import get_redis
+from .core.request_metrics import MetricsMiddleware
+from .core.sql_profile import load_profile
+from .core.principal import listen_invalidations
 from .api import auth_router, channels_router, videos_router, interactions_router
 
 app = FastAPI(
@@ -20,6 +27,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 最後に追加したミドルウェアが最も外側になる（CORS の処理時間も含めて計測する）
+app.add_middleware(MetricsMiddleware)
 
 # ルーター登録
 app.include_router(auth_router)
@@ -28,12 +37,47 @@ app.include_router(videos_router)
 app.include_router(interactions_router)
 
 
+@app.on_event("startup")
+async def start_principal_invalidation_listener():
+    """他プロセスでの role / status 変更をプリンシパルキャッシュに反映する"""
+    app.state.principal_listener = asyncio.create_task(listen_invalidations())
+
+
+@app.on_event("shutdown")
+async def stop_principal_invalidation_listener():
+    app.state.principal_listener.cancel()
+
+
 @app.get("/health")
 async def health_check():
     """ヘルスチェック"""
     return {"status": "healthy", "app": settings.app_name}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 形式のメトリクス（このプロセスの値 + Redis に集計したワーカーの値）"""
+    lines = registry.render()
+    try:
+        values = await asyncio.gather(*(get_redis().hgetall(metric.key) for metric in REDIS_METRICS))
+        for metric, value in zip(REDIS_METRICS, values):
+            lines.extend(metric.render(value))
+    except Exception:
+        pass  # Redis が使えなくてもプロセス内のメトリクスは返す
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str):
+    """X-Profile ヘッダ付きリクエストの SQL タイムライン"""
+    if not settings.sql_profile_enabled:
+        raise HTTPException(status_code=404, detail="プロファイルが見つかりません")
+    profile = await load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="プロファイルが見つかりません")
+    return profile
+
+
 @app.get("/")
 async def root():
     """ルート"""
@@ -1,4 +1,5 @@
 from .user import User, UserRole, UserStatus
 from .channel import Channel
-from .video import Video, VideoVisibility, VideoStatus
+from .video import Video, VideoVisibility, VideoStatus, PLAYABLE_STATUSES
+from .media_asset import MediaAsset, MediaAssetStatus
 from .interactions import Comment, Like, Report, WatchHistory, CommentStatus, ReportReason, ReportStatus, ReportTargetType
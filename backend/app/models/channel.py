@@ -19,7 +19,7 @@ class Channel(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relationships
-    owner = relationship("User", back_populates="channels")
-    videos = relationship("Video", back_populates="channel", lazy="selectin")
+    # Relationships（既定では読み込まない。必要なクエリで selectinload 等を指定する）
+    owner = relationship("User", back_populates="channels", lazy="raise")
+    videos = relationship("Video", back_populates="channel", lazy="raise")
 
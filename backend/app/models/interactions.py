@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, UniqueConstraint, Integer
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, UniqueConstraint, Integer, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -24,9 +24,18 @@ class Comment(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     deleted_at = Column(DateTime, nullable=True)
 
-    # Relationships
-    video = relationship("Video", back_populates="comments")
-    user = relationship("User", back_populates="comments")
+    # Relationships（既定では読み込まない。user はレスポンスに含まれるため noload）
+    video = relationship("Video", back_populates="comments", lazy="raise")
+    user = relationship("User", back_populates="comments", lazy="noload")
+
+    # 動画ごとのコメント一覧（新しい順）のキーセットページネーション用
+    __table_args__ = (
+        Index(
+            "ix_comments_video_active_created_at_id",
+            video_id, created_at.desc(), id.desc(),
+            postgresql_where=text("status = 'active'"),
+        ),
+    )
 
 
 class Like(Base):
@@ -37,8 +46,13 @@ class Like(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
-    user = relationship("User", back_populates="likes")
-    video = relationship("Video", back_populates="likes")
+    user = relationship("User", back_populates="likes", lazy="raise")
+    video = relationship("Video", back_populates="likes", lazy="raise")
+
+    # 主キーは (user_id, video_id) のため、動画単位の集計・削除用に video_id 単独のインデックスを張る
+    __table_args__ = (
+        Index("ix_likes_video_id", video_id),
+    )
 
 
 class ReportReason(str, PyEnum):
@@ -82,3 +96,8 @@ class WatchHistory(Base):
     video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id"), primary_key=True)
     last_position_sec = Column(Integer, default=0)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # ユーザーごとの最近の視聴（続きから見る）用
+    __table_args__ = (
+        Index("ix_watch_history_user_updated_at", user_id, updated_at.desc()),
+    )
@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime
+from enum import Enum as PyEnum
+from sqlalchemy import Column, String, DateTime, Enum, Integer, ARRAY
+from sqlalchemy.dialects.postgresql import UUID
+from ..database import Base
+
+
+class MediaAssetStatus(str, PyEnum):
+    PROCESSING = "processing"
+    READY = "ready"
+
+
+class MediaAsset(Base):
+    """内容ハッシュで識別する変換済みメディア（同一ファイルの動画間で共有する）"""
+    __tablename__ = "media_assets"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), unique=True, nullable=False)  # 元動画の SHA-256
+    status = Column(Enum(MediaAssetStatus), default=MediaAssetStatus.PROCESSING, nullable=False)
+    source_key = Column(String(500), nullable=False)  # 元動画のオブジェクトキー
+    storage_prefix = Column(String(500), nullable=False)  # HLS・サムネイルの格納先
+    hls_master_url = Column(String(500), nullable=True)
+    thumbnail_url = Column(String(500), nullable=True)
+    ready_renditions = Column(ARRAY(String), default=[])
+    duration = Column(Integer, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False)  # 参照している動画の数
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,10 +1,14 @@
 import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, Integer, ARRAY
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, Integer, ARRAY, event, inspect
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, Session
 from ..database import Base
+from ..core.principal import publish_invalidation
+
+# コミット後に無効化するユーザーID（Session.info のキー）
+_PRINCIPAL_CHANGES = "principal_changes"
 
 
 class UserRole(str, PyEnum):
@@ -34,7 +38,28 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relationships
-    channels = relationship("Channel", back_populates="owner", lazy="selectin")
-    comments = relationship("Comment", back_populates="user", lazy="selectin")
-    likes = relationship("Like", back_populates="user", lazy="selectin")
+    # Relationships（既定では読み込まない。必要なクエリで selectinload 等を指定する）
+    channels = relationship("Channel", back_populates="owner", lazy="raise")
+    comments = relationship("Comment", back_populates="user", lazy="raise")
+    likes = relationship("Like", back_populates="user", lazy="raise")
+
+
+@event.listens_for(User, "after_update")
+def collect_principal_changes(mapper, connection, target):
+    """role / status の変更を記録（コミット前に消すと古い行で再キャッシュされるため）"""
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.status.history.has_changes():
+        state.session.info.setdefault(_PRINCIPAL_CHANGES, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_principal_cache(session):
+    """コミット後にプリンシパルキャッシュを無効化（他プロセスにも通知）"""
+    user_ids = session.info.pop(_PRINCIPAL_CHANGES, None)
+    if user_ids:
+        publish_invalidation(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_principal_changes(session):
+    session.info.pop(_PRINCIPAL_CHANGES, None)
@@ -1,9 +1,9 @@
 import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, Integer, ARRAY
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Text, Integer, BigInteger, ARRAY, Index, text
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from ..database import Base
 
 
@@ -16,11 +16,17 @@ class VideoVisibility(str, PyEnum):
 class VideoStatus(str, PyEnum):
     UPLOADING = "uploading"
     PROCESSING = "processing"
+    PLAYABLE = "playable"  # 最低画質のみ変換しながら再生可能
+    PARTIALLY_READY = "partially_ready"  # 一部のレンディションが変換済み
     READY = "ready"
     PUBLISHED = "published"
     FAILED = "failed"
 
 
+# 再生できる状態（途中公開中の動画を含む）
+PLAYABLE_STATUSES = (VideoStatus.PLAYABLE, VideoStatus.PARTIALLY_READY, VideoStatus.READY, VideoStatus.PUBLISHED)
+
+
 class Video(Base):
     __tablename__ = "videos"
 
@@ -33,16 +39,45 @@ class Video(Base):
     status = Column(Enum(VideoStatus), default=VideoStatus.UPLOADING, nullable=False)
     duration = Column(Integer, nullable=True)  # 秒
     source_url = Column(String(500), nullable=True)  # オリジナル動画URL
+    upload_id = Column(String(255), nullable=True)  # 進行中のマルチパートアップロードID
+    upload_size = Column(BigInteger, nullable=True)  # マルチパートアップロードで申告されたファイルサイズ
+    asset_id = Column(UUID(as_uuid=True), ForeignKey("media_assets.id"), nullable=True)  # 共有する変換済みメディア
     hls_master_url = Column(String(500), nullable=True)  # HLSマスターURL
+    ready_renditions = Column(ARRAY(String), default=[])  # マスターに掲載済みのレンディション
     thumbnail_url = Column(String(500), nullable=True)
     view_count = Column(Integer, default=0)
     like_count = Column(Integer, default=0)
     comment_count = Column(Integer, default=0)
     published_at = Column(DateTime, nullable=True)
+    search_vector = deferred(Column(TSVECTOR, nullable=True))  # 全文検索用（トリガーで更新）
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Relationships
-    channel = relationship("Channel", back_populates="videos")
-    comments = relationship("Comment", back_populates="video", lazy="selectin")
-    likes = relationship("Like", back_populates="video", lazy="selectin")
+    # Relationships（既定では読み込まない。必要なクエリで joinedload 等を指定する）
+    # channel はレスポンスに含まれるため、指定が無ければ None になる noload にする
+    channel = relationship("Channel", back_populates="videos", lazy="noload")
+    comments = relationship("Comment", back_populates="video", lazy="raise")
+    likes = relationship("Like", back_populates="video", lazy="raise")
+
+    # 公開動画一覧のキーセットページネーション用インデックス
+    __table_args__ = (
+        Index(
+            "ix_videos_public_published_at_id",
+            published_at.desc(), id.desc(),
+            postgresql_where=text("visibility = 'public' AND status = 'published'"),
+        ),
+        Index(
+            "ix_videos_public_view_count_id",
+            view_count.desc(), id.desc(),
+            postgresql_where=text("visibility = 'public' AND status = 'published'"),
+        ),
+        # カウンタ整合性チェックのウォーターマーク走査用
+        Index("ix_videos_updated_at_id", updated_at, id),
+        # 全文検索・部分一致検索用インデックス
+        Index("ix_videos_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_videos_title_trgm", title, postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index(
+            "ix_videos_description_trgm", description,
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+    )
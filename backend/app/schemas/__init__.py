@@ -1,4 +1,10 @@
 from .auth import UserCreate, UserLogin, UserResponse, TokenResponse
 from .channel import ChannelCreate, ChannelUpdate, ChannelResponse
-from .video import VideoCreate, VideoUpdate, VideoResponse, VideoListResponse, UploadInitResponse, UploadCompleteRequest
-from .interactions import CommentCreate, CommentResponse, CommentListResponse, ReportCreate, ReportResponse
+from .video import (
+    VideoCreate, VideoUpdate, VideoResponse, VideoListResponse, VideoCardResponse, VideoBatchResponse, UploadInitResponse, UploadCompleteRequest,
+    UploadPart, UploadPartUrlsRequest, UploadPartUrlsResponse,
+)
+from .interactions import (
+    CommentCreate, CommentResponse, CommentListResponse, ReportCreate, ReportResponse,
+    WatchHeartbeat, WatchHeartbeatBatch, ContinueWatchingItem, ContinueWatchingResponse,
+)
@@ -1,7 +1,8 @@
 from datetime import datetime
 from uuid import UUID
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from .auth import UserResponse
+from .video import VideoResponse
 
 
 class CommentCreate(BaseModel):
@@ -22,7 +23,8 @@ class CommentResponse(BaseModel):
 
 class CommentListResponse(BaseModel):
     comments: list[CommentResponse]
-    total: int
+    total: int  # 動画のコメント数（videos.comment_count）
+    next_cursor: str | None = None
 
 
 class ReportCreate(BaseModel):
@@ -44,3 +46,22 @@ class ReportResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class WatchHeartbeat(BaseModel):
+    video_id: UUID
+    position_sec: int = Field(ge=0)
+
+
+class WatchHeartbeatBatch(BaseModel):
+    heartbeats: list[WatchHeartbeat]
+
+
+class ContinueWatchingItem(BaseModel):
+    video: VideoResponse
+    position_sec: int
+    watched_at: datetime
+
+
+class ContinueWatchingResponse(BaseModel):
+    items: list[ContinueWatchingItem]
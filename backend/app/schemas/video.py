@@ -12,6 +12,7 @@ class VideoBase(BaseModel):
 
 class VideoCreate(VideoBase):
     channel_id: UUID
+    file_size: int | None = None  # 指定時はマルチパートアップロードになる
 
 
 class VideoUpdate(BaseModel):
@@ -43,18 +44,57 @@ class VideoResponse(BaseModel):
         from_attributes = True
 
 
+class VideoCardResponse(BaseModel):
+    """一覧・カード表示用の軽量な動画情報（説明文・関連を含まない）"""
+    id: UUID
+    channel_id: UUID
+    title: str
+    thumbnail_url: str | None = None
+    duration: int | None = None
+    view_count: int
+    like_count: int
+    published_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class VideoBatchResponse(BaseModel):
+    videos: list[VideoCardResponse]  # リクエストの ids の順
+    missing: list[UUID]  # 見つからない・非公開の ID
+
+
 class VideoListResponse(BaseModel):
     videos: list[VideoResponse]
-    total: int
-    page: int
+    total: int | None = None  # with_total=false の場合は None
+    page: int | None = None  # カーソル指定時は None
     per_page: int
+    next_cursor: str | None = None
 
 
 class UploadInitResponse(BaseModel):
     video_id: UUID
-    upload_url: str
+    upload_url: str | None = None  # 単一PUTの場合のみ
+    upload_id: str | None = None  # マルチパートの場合のみ
+    part_size: int | None = None
+    part_urls: list[str] = []  # パート番号 1..N の順
     expires_in: int = 3600
 
 
+class UploadPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class UploadPartUrlsRequest(BaseModel):
+    part_numbers: list[int]
+
+
+class UploadPartUrlsResponse(BaseModel):
+    part_urls: dict[int, str]
+    expires_in: int
+
+
 class UploadCompleteRequest(BaseModel):
     video_id: UUID
+    parts: list[UploadPart] | None = None  # マルチパートの場合は全パートの ETag
@@ -1,2 +1,3 @@
 from .celery_app import celery_app
-from .tasks import transcode_video
+from .tasks import transcode_video, deduplicate_video, transcode_progressive, transcode_chunk, finalize_transcode, delete_media_objects
+from .periodic import flush_view_counts, flush_watch_history, cleanup_abandoned_uploads, reconcile_counters, refresh_rankings
@@ -5,9 +5,11 @@ celery_app = Celery(
     "video_platform",
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=["app.workers.tasks"],
+    include=["app.workers.tasks", "app.workers.periodic"],
 )
 
+TASK_TIME_LIMIT = 3600  # 1時間
+
 celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
@@ -15,5 +17,35 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
-    task_time_limit=3600,  # 1時間
+    task_time_limit=TASK_TIME_LIMIT,
+    # 長時間タスクをワーカー間で均等に分散させる（chord のファンアウト用）
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    # acks_late のタスクは visibility_timeout までに ack されないと別のワーカーに再配信される。
+    # 実行中のタスクが二重に動かないよう、時間制限より十分長くする
+    broker_transport_options={"visibility_timeout": TASK_TIME_LIMIT * 2},
 )
+
+# 定期実行タスク（celery beat）
+celery_app.conf.beat_schedule = {
+    "flush-view-counts": {
+        "task": "app.workers.periodic.flush_view_counts",
+        "schedule": float(settings.view_flush_interval_seconds),
+    },
+    "flush-watch-history": {
+        "task": "app.workers.periodic.flush_watch_history",
+        "schedule": float(settings.watch_history_flush_interval_seconds),
+    },
+    "reconcile-counters": {
+        "task": "app.workers.periodic.reconcile_counters",
+        "schedule": float(settings.reconcile_interval_seconds),
+    },
+    "refresh-rankings": {
+        "task": "app.workers.periodic.refresh_rankings",
+        "schedule": float(settings.ranking_refresh_interval_seconds),
+    },
+    "cleanup-abandoned-uploads": {
+        "task": "app.workers.periodic.cleanup_abandoned_uploads",
+        "schedule": float(settings.abandoned_upload_cleanup_interval_seconds),
+    },
+}
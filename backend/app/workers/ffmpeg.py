@@ -0,0 +1,177 @@
+"""FFmpeg / ffprobe のコマンド組み立てと HLS プレイリスト生成"""
+import json
+import math
+import subprocess
+
+# HLSセグメント長（秒）
+HLS_SEGMENT_SECONDS = 6
+AUDIO_BITRATE = "128k"
+
+# 出力レンディション（高画質順）
+RENDITIONS = [
+    {"name": "1080p", "width": 1920, "height": 1080, "video_bitrate": "5M", "bandwidth": 5_128_000},
+    {"name": "720p", "width": 1280, "height": 720, "video_bitrate": "3M", "bandwidth": 3_128_000},
+    {"name": "480p", "width": 854, "height": 480, "video_bitrate": "1M", "bandwidth": 1_128_000},
+]
+RENDITIONS_BY_NAME = {r["name"]: r for r in RENDITIONS}
+
+
+# HTTP入力（プリサインURL）の一時的な切断から再接続する
+HTTP_INPUT_OPTIONS = ["-reconnect", "1", "-reconnect_on_network_error", "1", "-reconnect_delay_max", "10"]
+
+
+def input_options(input_path: str) -> list[str]:
+    """入力がURLの場合の追加オプション"""
+    return HTTP_INPUT_OPTIONS if input_path.startswith(("http://", "https://")) else []
+
+
+def run(cmd: list[str]) -> subprocess.CompletedProcess:
+    """コマンドを実行し、失敗したら例外を送出"""
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} failed: {result.stderr}")
+    return result
+
+
+def probe(input_path: str) -> dict:
+    """動画の長さと映像サイズを取得"""
+    result = run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "format=duration:stream=width,height",
+        "-of", "json",
+        input_path,
+    ])
+    info = json.loads(result.stdout or "{}")
+    streams = info.get("streams") or [{}]
+    duration = info.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration else 0.0,
+        "width": streams[0].get("width") or 0,
+        "height": streams[0].get("height") or 0,
+    }
+
+
+def select_renditions(source_height: int) -> list[dict]:
+    """元動画より大きいレンディションを除外（最低画質は常に出力）"""
+    selected = [r for r in RENDITIONS if r["height"] <= source_height]
+    return selected or [RENDITIONS[-1]]
+
+
+def thumbnail_command(input_path: str, output_path: str) -> list[str]:
+    """サムネイル生成コマンド"""
+    return [
+        "ffmpeg", "-y",
+        "-ss", "00:00:01",
+        *input_options(input_path), "-i", input_path,
+        "-vframes", "1",
+        "-q:v", "2",
+        output_path,
+    ]
+
+
+def plan_chunks(duration: float, chunk_seconds: int | None) -> list[tuple[float, float | None]]:
+    """エンコード単位（開始秒, 長さ）の一覧を作る
+
+    chunk_seconds を指定するとセグメント長の倍数に切り上げた長さで分割する。
+    各チャンクは再エンコード時に先頭がキーフレームになり、チャンク内も
+    セグメント境界でキーフレームを打つため、チャンク境界は常に GOP 境界に一致する。
+    """
+    if not chunk_seconds or duration <= chunk_seconds:
+        return [(0.0, None)]
+    chunk_seconds = math.ceil(chunk_seconds / HLS_SEGMENT_SECONDS) * HLS_SEGMENT_SECONDS
+    return [
+        (float(start), float(min(chunk_seconds, duration - start)))
+        for start in range(0, math.ceil(duration), chunk_seconds)
+    ]
+
+
+def chunk_name(rendition: dict, index: int) -> str:
+    return f"{rendition['name']}_{index:04d}"
+
+
+def chunk_command(
+    input_path: str,
+    output_dir: str,
+    rendition: dict,
+    index: int,
+    start: float,
+    duration: float | None,
+    event: bool = False,
+    preset: str = "medium",
+) -> list[str]:
+    """1レンディション・1チャンク分のHLSエンコードコマンド
+
+    レンディション間で切り替えられるよう、キーフレームをセグメント境界に揃える。
+    出力タイムスタンプはチャンクの開始位置からの通し時刻にする。
+    event=True の場合は変換中に再生できる EVENT プレイリストを出力する。
+    preset は x264 のプリセット（速度と圧縮率のトレードオフ）。
+    """
+    name = chunk_name(rendition, index)
+    seek = ["-ss", f"{start:.3f}"] if start else []
+    limit = ["-t", f"{duration:.3f}"] if duration else []
+    playlist_type = ["-hls_playlist_type", "event"] if event else []
+    return [
+        "ffmpeg", "-y", *seek, *input_options(input_path), "-i", input_path, *limit,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-vf", f"scale=w={rendition['width']}:h={rendition['height']}",
+        "-c:v", "libx264", "-preset", preset, "-b:v", rendition["video_bitrate"],
+        "-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})",
+        "-sc_threshold", "0",
+        "-c:a", "aac", "-b:a", AUDIO_BITRATE,
+        "-output_ts_offset", f"{start:.3f}",
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_list_size", "0",
+        *playlist_type,
+        "-hls_flags", "temp_file",
+        "-hls_segment_filename", f"{output_dir}/segment_{name}_%03d.ts",
+        f"{output_dir}/chunk_{name}.m3u8",
+    ]
+
+
+def parse_media_playlist(text: str) -> list[tuple[float, str]]:
+    """メディアプレイリストから (長さ, セグメント名) の一覧を取り出す"""
+    segments = []
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",", 1)[0])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((duration, line))
+            duration = None
+    return segments
+
+
+def media_playlist(chunks: list[list[tuple[float, str]]]) -> str:
+    """チャンクごとのセグメントを連結してVODメディアプレイリストを生成
+
+    チャンクは個別にエンコードされ AAC のプライミング等で境界がずれうるため、
+    チャンク境界に EXT-X-DISCONTINUITY を入れてデコーダをリセットさせる。
+    """
+    durations = [d for segments in chunks for d, _ in segments]
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(durations, default=HLS_SEGMENT_SECONDS))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for i, segments in enumerate(chunks):
+        if i > 0:
+            lines.append("#EXT-X-DISCONTINUITY")
+        for duration, filename in segments:
+            lines.append(f"#EXTINF:{duration:.6f},")
+            lines.append(filename)
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def master_playlist(renditions: list[dict]) -> str:
+    """マスタープレイリストを生成（高画質順）"""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for r in sorted(renditions, key=lambda r: r["bandwidth"], reverse=True):
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={r['bandwidth']},RESOLUTION={r['width']}x{r['height']}")
+        lines.append(f"stream_{r['name']}.m3u8")
+    return "\n".join(lines) + "\n"
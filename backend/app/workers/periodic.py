@@ -0,0 +1,355 @@
+"""Celery beat から定期実行されるタスク"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
+import redis
+from sqlalchemy import select, update, func, or_, tuple_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import OperationalError
+
+from .celery_app import celery_app
+from .resources import get_sync_db
+from ..core.config import settings
+from ..core.metrics import counter_reconcile_drift_total
+from ..core.ranking import RANKINGS, score_expression
+from ..core.redis import get_sync_redis
+from ..core.storage import get_storage
+from ..core import watch_history
+from ..core.view_counter import PENDING_KEY, FLUSHING_KEY_PREFIX
+from ..models import Video, VideoStatus, VideoVisibility, Like, Comment, CommentStatus, WatchHistory
+
+logger = logging.getLogger(__name__)
+
+# 1ステートメントあたりの最大ID数
+VIEW_FLUSH_BATCH_SIZE = 1000
+
+
+@celery_app.task
+def flush_view_counts():
+    """バッファされた視聴回数を videos.view_count にまとめて反映"""
+    r = get_sync_redis()
+    # 取り残されたキーを reconcile_counters が検出できるよう作成時刻を含める
+    flushing_key = f"{FLUSHING_KEY_PREFIX}{int(time.time())}:{uuid4().hex}"
+
+    # バッファをアトミックに切り離す（以降の視聴は新しいハッシュに積まれる）
+    try:
+        r.rename(PENDING_KEY, flushing_key)
+    except redis.ResponseError:
+        return {"videos": 0, "views": 0}
+
+    pending = r.hgetall(flushing_key)
+
+    # 増分ごとにIDをまとめ、UPDATE ... WHERE id IN (...) の回数を減らす
+    ids_by_increment: dict[int, list[UUID]] = defaultdict(list)
+    for video_id, count in pending.items():
+        ids_by_increment[int(count)].append(UUID(video_id))
+
+    db = get_sync_db()
+    try:
+        conn = db.connection()
+        for increment, video_ids in ids_by_increment.items():
+            # ロック順を固定してデッドロックを避ける
+            video_ids.sort()
+            for i in range(0, len(video_ids), VIEW_FLUSH_BATCH_SIZE):
+                conn.execute(
+                    update(Video.__table__)
+                    .where(Video.id.in_(video_ids[i:i + VIEW_FLUSH_BATCH_SIZE]))
+                    .values(view_count=Video.view_count + increment)
+                )
+        db.commit()
+    except Exception:
+        db.rollback()
+        # 反映できなかった分はバッファに戻す
+        pipe = r.pipeline()
+        for video_id, count in pending.items():
+            pipe.hincrby(PENDING_KEY, video_id, int(count))
+        pipe.delete(flushing_key)
+        pipe.execute()
+        raise
+    finally:
+        db.close()
+
+    r.delete(flushing_key)
+    return {"videos": len(pending), "views": sum(int(c) for c in pending.values())}
+
+
+@celery_app.task
+def cleanup_abandoned_uploads():
+    """完了されないまま放置されたアップロードを破棄する"""
+    storage = get_storage()
+    cutoff = datetime.utcnow() - timedelta(hours=settings.abandoned_upload_hours)
+
+    db = get_sync_db()
+    try:
+        videos = db.execute(
+            select(Video)
+            .where(Video.status == VideoStatus.UPLOADING, Video.created_at < cutoff)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        for video in videos:
+            if video.upload_id:
+                try:
+                    storage.abort_multipart_upload(video.source_url, video.upload_id)
+                except Exception:
+                    logger.warning("failed to abort upload %s for video %s", video.upload_id, video.id, exc_info=True)
+            elif video.source_url:
+                # 単一PUTで途中まで（または完了通知なしで）送られたオリジナル
+                try:
+                    storage.delete(video.source_url)
+                except Exception:
+                    logger.warning("failed to delete upload %s for video %s", video.source_url, video.id, exc_info=True)
+            video.upload_id = None
+            video.status = VideoStatus.FAILED
+        db.commit()
+    finally:
+        db.close()
+
+    # DBから辿れないマルチパートアップロード（作成直後の失敗など）もパート分の容量を占有するため破棄する
+    orphaned = 0
+    for upload in storage.list_multipart_uploads("uploads/"):
+        if upload["initiated"] < cutoff:
+            try:
+                storage.abort_multipart_upload(upload["key"], upload["upload_id"])
+            except Exception:
+                logger.warning("failed to abort orphaned upload %s", upload["upload_id"], exc_info=True)
+                continue
+            orphaned += 1
+
+    return {"videos": len(videos), "orphaned_uploads": orphaned}
+
+
+# 1ステートメントで upsert する行数
+WATCH_HISTORY_BATCH_SIZE = 1000
+
+
+@celery_app.task
+def flush_watch_history():
+    """バッファされた再生位置を watch_history にまとめて upsert"""
+    r = get_sync_redis()
+    flushing_key = f"{watch_history.FLUSHING_KEY_PREFIX}{int(time.time())}:{uuid4().hex}"
+
+    try:
+        r.rename(watch_history.PENDING_KEY, flushing_key)
+    except redis.ResponseError:
+        return {"rows": 0}
+
+    pending = r.hgetall(flushing_key)
+    rows = []
+    for field, entry in pending.items():
+        user_id, video_id = field.split(":")
+        position_sec, watched_at = watch_history.decode_entry(entry)
+        rows.append({
+            "user_id": UUID(user_id),
+            "video_id": UUID(video_id),
+            "last_position_sec": position_sec,
+            "updated_at": datetime.utcfromtimestamp(watched_at),
+        })
+    # ロック順を固定してデッドロックを避ける
+    rows.sort(key=lambda row: (row["user_id"], row["video_id"]))
+
+    db = get_sync_db()
+    try:
+        conn = db.connection()
+        # 削除済み・存在しない動画への位置は外部キー違反になるため除く
+        existing = set(conn.execute(
+            select(Video.id).where(Video.id.in_(list({row["video_id"] for row in rows})))
+        ).scalars())
+        rows = [row for row in rows if row["video_id"] in existing]
+
+        for i in range(0, len(rows), WATCH_HISTORY_BATCH_SIZE):
+            stmt = pg_insert(WatchHistory.__table__).values(rows[i:i + WATCH_HISTORY_BATCH_SIZE])
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["user_id", "video_id"],
+                set_={"last_position_sec": stmt.excluded.last_position_sec, "updated_at": stmt.excluded.updated_at},
+                # 遅れて届いた古い位置で上書きしない
+                where=WatchHistory.__table__.c.updated_at < stmt.excluded.updated_at,
+            ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        # 反映できなかった分はバッファに戻す（その間に届いた新しい位置は上書きしない）
+        pipe = r.pipeline()
+        for field, entry in pending.items():
+            pipe.hsetnx(watch_history.PENDING_KEY, field, entry)
+        pipe.delete(flushing_key)
+        pipe.execute()
+        raise
+    finally:
+        db.close()
+
+    r.delete(flushing_key)
+    return {"rows": len(rows)}
+
+
+RECONCILE_WATERMARK_KEY = "reconcile:videos:watermark"
+
+
+def recover_orphaned_view_buffers(r: redis.Redis) -> int:
+    """フラッシュ途中でワーカーが落ちて残った views:flushing:* をバッファに戻す"""
+    cutoff = time.time() - settings.reconcile_orphaned_flush_seconds
+    recovered = 0
+    for key in r.scan_iter(match=f"{FLUSHING_KEY_PREFIX}*", count=100):
+        created_at = key[len(FLUSHING_KEY_PREFIX):].split(":", 1)[0]
+        if not created_at.isdigit() or int(created_at) >= cutoff:
+            continue
+        pending = r.hgetall(key)
+        pipe = r.pipeline()
+        for video_id, count in pending.items():
+            pipe.hincrby(PENDING_KEY, video_id, int(count))
+        pipe.delete(key)
+        pipe.execute()
+        recovered += sum(int(c) for c in pending.values())
+    return recovered
+
+
+def recover_orphaned_watch_buffers(r: redis.Redis) -> int:
+    """フラッシュ途中でワーカーが落ちて残った watch:flushing:* をバッファに戻す"""
+    cutoff = time.time() - settings.reconcile_orphaned_flush_seconds
+    recovered = 0
+    for key in r.scan_iter(match=f"{watch_history.FLUSHING_KEY_PREFIX}*", count=100):
+        created_at = key[len(watch_history.FLUSHING_KEY_PREFIX):].split(":", 1)[0]
+        if not created_at.isdigit() or int(created_at) >= cutoff:
+            continue
+        pending = r.hgetall(key)
+        pipe = r.pipeline()
+        for field, entry in pending.items():
+            # その後に届いた新しい位置は上書きしない
+            pipe.hsetnx(watch_history.PENDING_KEY, field, entry)
+        pipe.delete(key)
+        pipe.execute()
+        recovered += len(pending)
+    return recovered
+
+
+def _reconcile_statement(video_ids: list[UUID]):
+    """バッチ内の like_count / comment_count を実数に合わせる UPDATE（ずれた行のみ更新）"""
+    videos = Video.__table__
+    actual = (
+        select(
+            videos.c.id,
+            videos.c.like_count.label("old_like_count"),
+            videos.c.comment_count.label("old_comment_count"),
+            select(func.count()).where(Like.video_id == videos.c.id).scalar_subquery().label("like_count"),
+            select(func.count())
+            .where(Comment.video_id == videos.c.id, Comment.status == CommentStatus.ACTIVE)
+            .scalar_subquery()
+            .label("comment_count"),
+        )
+        .where(videos.c.id.in_(video_ids))
+        .cte("actual")
+    )
+    return (
+        update(videos)
+        .where(videos.c.id == actual.c.id)
+        .where(or_(
+            func.coalesce(actual.c.old_like_count, -1) != actual.c.like_count,
+            func.coalesce(actual.c.old_comment_count, -1) != actual.c.comment_count,
+        ))
+        # 補正自体で updated_at を進めると次回も対象になるため据え置く
+        .values(like_count=actual.c.like_count, comment_count=actual.c.comment_count, updated_at=videos.c.updated_at)
+        .returning(
+            actual.c.old_like_count, actual.c.like_count,
+            actual.c.old_comment_count, actual.c.comment_count,
+        )
+    )
+
+
+@celery_app.task
+def reconcile_counters():
+    """非正規化カウンタ（like_count / comment_count）を likes・comments から再計算する
+
+    videos.updated_at と id のウォーターマーク以降に更新された動画を小さなバッチで
+    走査する（初回は全件）。バッチごとに短いトランザクションで補正し、ロック待ちが
+    長引く場合はそのバッチを諦めて次回に回す。
+    """
+    r = get_sync_redis()
+    drift = {"like_count": 0, "comment_count": 0, "view_count": recover_orphaned_view_buffers(r)}
+    recovered_positions = recover_orphaned_watch_buffers(r)
+
+    watermark = r.get(RECONCILE_WATERMARK_KEY)
+    if watermark:
+        last_updated_at, last_id = watermark.split("|")
+        last = (datetime.fromisoformat(last_updated_at), UUID(last_id))
+    else:
+        last = (datetime.min, UUID(int=0))
+    # 更新直後の行はトランザクション途中の可能性があるため少し遅らせて扱う
+    horizon = datetime.utcnow() - timedelta(seconds=settings.reconcile_grace_seconds)
+
+    batches = 0
+    db = get_sync_db()
+    try:
+        while batches < settings.reconcile_max_batches:
+            rows = db.execute(
+                select(Video.id, Video.updated_at)
+                .where(tuple_(Video.updated_at, Video.id) > tuple_(*last), Video.updated_at < horizon)
+                .order_by(Video.updated_at, Video.id)
+                .limit(settings.reconcile_batch_size)
+            ).all()
+            db.commit()
+            if not rows:
+                break
+
+            try:
+                db.execute(text(f"SET LOCAL lock_timeout = '{int(settings.reconcile_lock_timeout_ms)}ms'"))
+                changed = db.execute(_reconcile_statement([row.id for row in rows])).all()
+                db.commit()
+            except OperationalError:
+                # 書き込みが集中している行のロック待ち。ウォーターマークを進めず次回に再試行する
+                db.rollback()
+                logger.info("counter reconciliation batch skipped due to lock timeout")
+                break
+
+            for row in changed:
+                drift["like_count"] += abs((row.old_like_count or 0) - row.like_count)
+                drift["comment_count"] += abs((row.old_comment_count or 0) - row.comment_count)
+
+            last = (rows[-1].updated_at, rows[-1].id)
+            r.set(RECONCILE_WATERMARK_KEY, f"{last[0].isoformat()}|{last[1]}")
+            batches += 1
+    finally:
+        db.close()
+
+    for counter, value in drift.items():
+        if value:
+            counter_reconcile_drift_total.inc(counter, value)
+    return {"batches": batches, "drift": drift, "recovered_watch_positions": recovered_positions}
+
+
+# ZADD 1回あたりの要素数
+RANKING_ZADD_BATCH_SIZE = 1000
+
+
+@celery_app.task
+def refresh_rankings():
+    """人気順・急上昇ランキングを再計算して Redis のソート済みセットを置き換える"""
+    r = get_sync_redis()
+    sizes = {}
+    db = get_sync_db()
+    try:
+        for ranking in RANKINGS:
+            score = score_expression(ranking).label("score")
+            query = (
+                select(Video.id, score)
+                .where(Video.visibility == VideoVisibility.PUBLIC, Video.status == VideoStatus.PUBLISHED)
+                .order_by(score.desc(), Video.id.desc())
+                .limit(settings.ranking_size)
+            )
+            if ranking.window_days:
+                query = query.where(Video.published_at >= datetime.utcnow() - timedelta(days=ranking.window_days))
+            rows = db.execute(query).all()
+            db.commit()
+
+            # 別キーに組み立ててから RENAME で差し替え、読み手には常に完全なランキングを見せる
+            building_key = f"{ranking.key}:building:{uuid4().hex}"
+            for i in range(0, len(rows), RANKING_ZADD_BATCH_SIZE):
+                r.zadd(building_key, {str(row.id): float(row.score) for row in rows[i:i + RANKING_ZADD_BATCH_SIZE]})
+            if rows:
+                r.rename(building_key, ranking.key)
+            else:
+                r.delete(ranking.key)
+            sizes[ranking.name] = len(rows)
+    finally:
+        db.close()
+    return sizes
@@ -0,0 +1,72 @@
+"""ワーカープロセス単位で共有するリソース（DBエンジン・S3クライアント）
+
+prefork の子プロセスごとに worker_process_init で作り直し、タスクごとに
+コネクションプールを作らないようにする。
+"""
+import time
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from ..core.config import settings
+from ..core.metrics import worker_db_pool_checkout_seconds
+from ..core.s3 import reset_s3_client
+from ..core.sql_profile import instrument_engine
+
+_engine = None
+_session_factory = None
+
+
+class TimedQueuePool(QueuePool):
+    """コネクション取得の待ち時間を計測するプール"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            worker_db_pool_checkout_seconds.observe(time.perf_counter() - start)
+
+
+def init_engine() -> None:
+    """プロセス用のエンジンとセッションファクトリを作成"""
+    global _engine, _session_factory
+    _engine = create_engine(
+        settings.database_url,
+        poolclass=TimedQueuePool,
+        pool_size=settings.worker_db_pool_size,
+        max_overflow=settings.worker_db_max_overflow,
+        pool_pre_ping=True,
+    )
+    instrument_engine(_engine)
+    _session_factory = sessionmaker(bind=_engine)
+
+
+def dispose_engine(close: bool = True) -> None:
+    """エンジンを破棄（fork 直後は親の接続を閉じないよう close=False）"""
+    global _engine, _session_factory
+    if _engine is not None:
+        _engine.dispose(close=close)
+    _engine = None
+    _session_factory = None
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    """子プロセス起動時に親から引き継いだ接続を捨てて作り直す"""
+    dispose_engine(close=False)
+    reset_s3_client()
+    init_engine()
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker_process(**kwargs):
+    dispose_engine()
+
+
+def get_sync_db():
+    """同期DBセッションを取得（Celeryタスク用）"""
+    if _session_factory is None:
+        init_engine()
+    return _session_factory()
@@ -0,0 +1,116 @@
+"""変換処理のステージ計測
+
+tasks の各ステージ（重複判定・probe・サムネイル・エンコード・プレイリスト書き出し）を
+stage() で囲んでおき、add_hook で登録したフックに計測結果（StageStats）を渡す。
+フックが登録されていなければ何も計測しない。benchmarks.transcode が利用する。
+
+CPU 時間とピーク RSS は getrusage による。子プロセス（ffmpeg）の値は終了して
+回収された分だけが含まれ、ピーク RSS はプロセス内でのそれまでの最大値になる。
+"""
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+@dataclass
+class StageStats:
+    name: str
+    labels: dict = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0  # 自プロセス + 子プロセス（user + sys）
+    peak_rss_bytes: int = 0
+    peak_disk_bytes: int = 0  # 一時ディレクトリの最大使用量
+    output_bytes: int = 0  # ストレージに書き出したバイト数
+    upload_seconds: float = 0.0  # アップロードにかかった時間の合計（並列分は重複して数える）
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add_output(self, nbytes: int, seconds: float = 0.0) -> None:
+        # セグメントのアップロードスレッドからも呼ばれる
+        with self._lock:
+            self.output_bytes += nbytes
+            self.upload_seconds += seconds
+
+    def observe_disk(self, path: str) -> None:
+        used = directory_size(path)
+        with self._lock:
+            self.peak_disk_bytes = max(self.peak_disk_bytes, used)
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            **self.labels,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "peak_rss_mb": round(self.peak_rss_bytes / 2**20, 1),
+            "peak_disk_mb": round(self.peak_disk_bytes / 2**20, 1),
+            "output_mb": round(self.output_bytes / 2**20, 2),
+            "upload_seconds": round(self.upload_seconds, 3),
+        }
+
+
+_hooks: list[Callable[[StageStats], None]] = []
+_current: ContextVar[StageStats | None] = ContextVar("transcode_stage", default=None)
+
+
+def add_hook(hook: Callable[[StageStats], None]) -> None:
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Callable[[StageStats], None]) -> None:
+    _hooks.remove(hook)
+
+
+def current_stage() -> StageStats | None:
+    """計測中のステージ（計測していなければ None）"""
+    return _current.get()
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass  # アップロード後に削除されたファイル
+    return total
+
+
+def _cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _peak_rss_bytes() -> int:
+    # Linux の ru_maxrss は KiB 単位
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * 1024
+
+
+@contextmanager
+def stage(name: str, **labels):
+    """ブロックを 1 ステージとして計測し、終了時にフックへ渡す"""
+    if not _hooks:
+        yield None
+        return
+
+    stats = StageStats(name, labels)
+    token = _current.set(stats)
+    wall_start = time.perf_counter()
+    cpu_start = _cpu_seconds()
+    try:
+        yield stats
+    finally:
+        stats.wall_seconds = time.perf_counter() - wall_start
+        stats.cpu_seconds = _cpu_seconds() - cpu_start
+        stats.peak_rss_bytes = _peak_rss_bytes()
+        _current.reset(token)
+        for hook in list(_hooks):
+            hook(stats)
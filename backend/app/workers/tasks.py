@@ -1,135 +1,598 @@
+import hashlib
+import json
 import os
 import subprocess
 import tempfile
-from uuid import UUID
-import boto3
-from botocore.config import Config
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+from uuid import UUID, uuid4
+from celery import chord
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from .celery_app import celery_app
+from . import ffmpeg
+from .resources import get_sync_db
+from .stages import stage, current_stage
+from ..core import response_cache
 from ..core.config import settings
-from ..models import Video, VideoStatus
+from ..core.redis import get_sync_redis
+from ..core.storage import get_storage
+from ..models import Video, VideoStatus, VideoVisibility, MediaAsset, MediaAssetStatus
 
 
-def get_sync_db():
-    """同期DBセッションを取得（Celeryタスク用）"""
-    engine = create_engine(settings.database_url)
-    Session = sessionmaker(bind=engine)
-    return Session()
+def hls_base_key(video_id: str) -> str:
+    return f"videos/{video_id}/hls"
 
 
-def get_s3_client():
-    """S3クライアント取得"""
-    return boto3.client(
-        "s3",
-        endpoint_url=f"http://{settings.minio_endpoint}",
-        aws_access_key_id=settings.minio_access_key,
-        aws_secret_access_key=settings.minio_secret_key,
-        config=Config(signature_version="s3v4"),
-    )
+def source_url(storage, video_id: str) -> str:
+    """元動画のプリサインGET URLを取得（FFmpeg が直接ストリーミングで読む）"""
+    db = get_sync_db()
+    try:
+        video = db.query(Video).filter(Video.id == UUID(video_id)).first()
+        if not video:
+            raise ValueError(f"Video not found: {video_id}")
+        source_key = video.source_url
+    finally:
+        db.close()
+    return storage.presign("GET", source_key, expires_in=settings.transcode_source_url_expires_seconds)
 
 
-@celery_app.task(bind=True, max_retries=3)
-def transcode_video(self, video_id: str):
-    """動画をHLS形式に変換"""
+def content_hash(storage, key: str) -> str:
+    """元動画の SHA-256 をストリーミングで計算"""
+    digest = hashlib.sha256()
+    for chunk in storage.iter_chunks(key):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscodeCancelled(Exception):
+    """重複排除で不要になった変換の中断"""
+
+
+def cancel_key(video_id: str) -> str:
+    return f"transcode:{video_id}:cancelled"
+
+
+def is_cancelled(video_id: str) -> bool:
+    return bool(get_sync_redis().exists(cancel_key(video_id)))
+
+
+def owns_output(db, video: Video) -> bool:
+    """動画が自身の変換結果を使うか（重複排除で既存のメディアに紐付いた場合は False）"""
+    if not video.asset_id:
+        return True
+    asset = db.query(MediaAsset).filter(MediaAsset.id == video.asset_id).first()
+    return asset is None or asset.storage_prefix == f"videos/{video.id}"
+
+
+def discard_superseded_output(db, video: Video) -> None:
+    """重複排除された動画の元動画と途中までの変換結果を削除する（変換タスクの終了後に呼ぶ）"""
+    asset = db.query(MediaAsset).filter(MediaAsset.id == video.asset_id).first()
+    own_source = video.source_url if video.source_url != asset.source_key else None
+    video.source_url = asset.source_key
+    db.commit()
+    delete_media_objects.delay(own_source, f"videos/{video.id}")
+
+
+def link_existing_asset(storage, video_id: str) -> bool:
+    """同一内容の変換済みメディアがあれば動画に紐付ける（True なら自身の変換は不要）
+
+    変換と並行して実行する。紐付けた場合は変換タスクに中断を通知し、途中までの
+    出力は変換タスクの終了時（finalize_transcode / transcode_failed）に削除される。
+    無ければ内容ハッシュでメディアを登録し、この動画の変換結果をそのメディアとする。
+    同じ内容が別の動画で変換中の場合は重複排除せず、そのまま変換を続ける。
+    """
     db = get_sync_db()
-    s3 = get_s3_client()
-    
     try:
-        # 動画取得
         video = db.query(Video).filter(Video.id == UUID(video_id)).first()
         if not video:
             raise ValueError(f"Video not found: {video_id}")
-        
-        with tempfile.TemporaryDirectory() as tmpdir:
-            input_path = os.path.join(tmpdir, "input.mp4")
-            output_dir = os.path.join(tmpdir, "hls")
-            os.makedirs(output_dir)
-            
-            # S3から動画をダウンロード
-            s3.download_file(
-                settings.minio_bucket,
-                video.source_url,
-                input_path
+        if video.asset_id:
+            # リトライ時：判定済み
+            return not owns_output(db, video)
+        source_key = video.source_url
+    finally:
+        # ハッシュ計算中に接続を保持しない
+        db.close()
+    
+    digest = content_hash(storage, source_key)
+    
+    db = get_sync_db()
+    try:
+        video = db.query(Video).filter(Video.id == UUID(video_id)).with_for_update().first()
+        db.execute(
+            pg_insert(MediaAsset)
+            .values(
+                id=uuid4(), content_hash=digest, status=MediaAssetStatus.PROCESSING,
+                source_key=source_key, storage_prefix=f"videos/{video_id}", ref_count=0,
             )
-            
-            # FFmpegでHLS変換
-            # 複数解像度: 1080p, 720p, 480p
-            output_master = os.path.join(output_dir, "master.m3u8")
-            
-            cmd = [
-                "ffmpeg", "-i", input_path,
-                "-filter_complex",
-                "[0:v]split=3[v1][v2][v3];"
-                "[v1]scale=w=1920:h=1080[v1out];"
-                "[v2]scale=w=1280:h=720[v2out];"
-                "[v3]scale=w=854:h=480[v3out]",
-                "-map", "[v1out]", "-c:v:0", "libx264", "-b:v:0", "5M",
-                "-map", "[v2out]", "-c:v:1", "libx264", "-b:v:1", "3M",
-                "-map", "[v3out]", "-c:v:2", "libx264", "-b:v:2", "1M",
-                "-map", "0:a?", "-c:a", "aac", "-b:a", "128k",
-                "-f", "hls",
-                "-hls_time", "6",
-                "-hls_list_size", "0",
-                "-hls_segment_filename", os.path.join(output_dir, "segment_%v_%03d.ts"),
-                "-master_pl_name", "master.m3u8",
-                "-var_stream_map", "v:0,a:0 v:1,a:1 v:2,a:2",
-                os.path.join(output_dir, "stream_%v.m3u8"),
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                raise RuntimeError(f"FFmpeg failed: {result.stderr}")
-            
-            # サムネイル生成
-            thumbnail_path = os.path.join(tmpdir, "thumbnail.jpg")
-            subprocess.run([
-                "ffmpeg", "-i", input_path,
-                "-ss", "00:00:01",
-                "-vframes", "1",
-                "-q:v", "2",
-                thumbnail_path
-            ], capture_output=True)
-            
-            # 動画の長さ取得
-            duration_result = subprocess.run([
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                input_path
-            ], capture_output=True, text=True)
-            duration = int(float(duration_result.stdout.strip())) if duration_result.stdout.strip() else 0
-            
-            # S3にアップロード
-            hls_base_key = f"videos/{video_id}/hls"
-            
-            for filename in os.listdir(output_dir):
-                filepath = os.path.join(output_dir, filename)
-                s3_key = f"{hls_base_key}/{filename}"
-                content_type = "application/x-mpegURL" if filename.endswith(".m3u8") else "video/MP2T"
-                s3.upload_file(filepath, settings.minio_bucket, s3_key, ExtraArgs={"ContentType": content_type})
-            
-            # サムネイルアップロード
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+        )
+        asset = db.query(MediaAsset).filter(MediaAsset.content_hash == digest).with_for_update().one()
+        # ハッシュ計算中に自身の変換が終わっていれば、その出力をそのまま使う（duration は finalize で入る）
+        transcoded = video.duration is not None
+        
+        if asset.status == MediaAssetStatus.READY and not transcoded:
+            video.asset_id = asset.id
+            video.hls_master_url = asset.hls_master_url
+            video.thumbnail_url = asset.thumbnail_url
+            video.ready_renditions = asset.ready_renditions
+            video.duration = asset.duration
+            advance_status(video, VideoStatus.READY)
+            asset.ref_count += 1
+            db.commit()
+            # 進行中の変換を止める（source_url は途中出力の削除時に差し替える）
+            get_sync_redis().set(cancel_key(video_id), 1, ex=24 * 3600)
+            invalidate_video_cache(video)
+            return True
+        
+        if asset.ref_count == 0:
+            # 新規登録（または所有者が失敗して空いた）メディアをこの動画の出力で埋める
+            asset.source_key = source_key
+            asset.storage_prefix = f"videos/{video_id}"
+            asset.ref_count = 1
+            video.asset_id = asset.id
+            if transcoded:
+                asset.status = MediaAssetStatus.READY
+                asset.hls_master_url = video.hls_master_url
+                asset.thumbnail_url = video.thumbnail_url
+                asset.ready_renditions = video.ready_renditions
+                asset.duration = video.duration
+        db.commit()
+        return False
+    finally:
+        db.close()
+
+
+def invalidate_video_cache(video: Video) -> None:
+    """動画詳細・チャンネルのレスポンスキャッシュを破棄"""
+    response_cache.invalidate_sync(response_cache.video_tag(video.id), response_cache.channel_tag(video.channel_id))
+
+
+def put_playlist(storage, key: str, body: str) -> None:
+    """プレイリストをアップロード"""
+    data = body.encode()
+    storage.put(key, data, "application/x-mpegURL", cache_control="no-cache")
+    stats = current_stage()
+    if stats:
+        stats.add_output(len(data))
+
+
+def encode_and_upload(
+    storage,
+    cmd: list[str],
+    output_dir: str,
+    key_prefix: str,
+    live_playlist: tuple[str, str] | None = None,
+    on_first_publish: Callable[[], None] | None = None,
+    cancelled: Callable[[], bool] | None = None,
+) -> None:
+    """FFmpeg を実行しつつ、書き終わったセグメントから順に並列アップロードする
+
+    FFmpeg は hls_flags=temp_file で .tmp に書き込み、完成時にリネームするため、
+    .ts として現れたファイルは完成済みとして扱える。アップロード後はローカルから
+    削除し、一時ディスクの使用量をセグメント数個分に抑える。
+
+    live_playlist=(ローカル名, 公開名) を指定すると、記載セグメントのアップロードが
+    済んだ時点の FFmpeg のプレイリストを逐次公開する（EVENT プレイリスト用）。
+    cancelled が True を返したら FFmpeg を止めて TranscodeCancelled を送出する。
+    """
+    # アップロードはスレッドで行うため、計測中のステージはここで取得しておく
+    stats = current_stage()
+    
+    def upload(filename: str) -> None:
+        filepath = os.path.join(output_dir, filename)
+        start = time.perf_counter()
+        storage.upload_file(filepath, f"{key_prefix}/{filename}", "video/MP2T")
+        if stats:
+            stats.add_output(os.path.getsize(filepath), time.perf_counter() - start)
+        os.remove(filepath)
+    
+    uploads: dict[str, Future] = {}
+    published = None
+    
+    def submit_finished_segments(pool: ThreadPoolExecutor) -> None:
+        for filename in sorted(os.listdir(output_dir)):
+            if filename.endswith(".ts") and filename not in uploads:
+                uploads[filename] = pool.submit(upload, filename)
+    
+    def publish_live_playlist() -> None:
+        nonlocal published
+        local_name, public_name = live_playlist
+        path = os.path.join(output_dir, local_name)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            playlist = f.read()
+        listed = [filename for _, filename in ffmpeg.parse_media_playlist(playlist)]
+        if playlist == published or not listed:
+            return
+        if not all(filename in uploads and uploads[filename].done() for filename in listed):
+            return
+        put_playlist(storage, f"{key_prefix}/{public_name}", playlist)
+        if published is None and on_first_publish:
+            on_first_publish()
+        published = playlist
+    
+    stderr_path = os.path.join(output_dir, "ffmpeg.log")
+    with open(stderr_path, "w") as stderr, ThreadPoolExecutor(max_workers=settings.transcode_upload_concurrency) as pool:
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr)
+        next_cancel_check = time.monotonic() + settings.transcode_cancel_check_seconds
+        while proc.poll() is None:
+            if cancelled and time.monotonic() >= next_cancel_check:
+                next_cancel_check = time.monotonic() + settings.transcode_cancel_check_seconds
+                if cancelled():
+                    proc.kill()
+                    proc.wait()
+                    raise TranscodeCancelled()
+            if stats:
+                stats.observe_disk(output_dir)
+            submit_finished_segments(pool)
+            if live_playlist:
+                publish_live_playlist()
+            time.sleep(settings.transcode_upload_poll_seconds)
+        submit_finished_segments(pool)
+        
+        # アップロードの失敗はここで例外として送出される
+        for future in uploads.values():
+            future.result()
+    
+    if proc.returncode != 0:
+        with open(stderr_path) as f:
+            raise RuntimeError(f"ffmpeg failed: {f.read()}")
+    
+    if live_playlist:
+        publish_live_playlist()
+
+
+# 途中公開の状態遷移順（後ろに進む場合のみ更新する）
+PROGRESSIVE_STATUSES = [VideoStatus.PROCESSING, VideoStatus.PLAYABLE, VideoStatus.PARTIALLY_READY]
+
+
+def advance_status(video: Video, status: VideoStatus) -> None:
+    """再生可能になった動画の状態を進める（公開設定済みなら PUBLISHED にする）"""
+    if video.status == VideoStatus.PUBLISHED:
+        return
+    if video.visibility == VideoVisibility.PUBLIC:
+        video.status = VideoStatus.PUBLISHED
+        video.published_at = video.published_at or datetime.utcnow()
+    else:
+        video.status = status
+
+
+def publish_rendition(storage, video_id: str, rendition_name: str, status: VideoStatus) -> None:
+    """レンディションをマスタープレイリストに追加して公開する
+
+    複数のタスクから同時に呼ばれるため、動画行をロックしてマスターを書き換える。
+    """
+    db = get_sync_db()
+    try:
+        video = db.query(Video).filter(Video.id == UUID(video_id)).with_for_update().first()
+        if not video:
+            raise ValueError(f"Video not found: {video_id}")
+        if not owns_output(db, video):
+            return  # 重複排除済み（既存メディアの出力を公開中）
+        
+        ready = list(video.ready_renditions or [])
+        if rendition_name not in ready:
+            ready.append(rendition_name)
+        master_key = f"{hls_base_key(video_id)}/master.m3u8"
+        put_playlist(storage, master_key, ffmpeg.master_playlist([ffmpeg.RENDITIONS_BY_NAME[n] for n in ready]))
+        
+        video.ready_renditions = ready
+        video.hls_master_url = storage.public_url(master_key)
+        if video.status in PROGRESSIVE_STATUSES and PROGRESSIVE_STATUSES.index(video.status) < PROGRESSIVE_STATUSES.index(status):
+            advance_status(video, status)
+        db.commit()
+        invalidate_video_cache(video)
+    finally:
+        db.close()
+
+
+def chunks_key(video_id: str, rendition_name: str) -> str:
+    return f"transcode:{video_id}:{rendition_name}:chunks"
+
+
+def record_chunk(storage, video_id: str, rendition_name: str, index: int, chunk_count: int, segments: list) -> None:
+    """完了したチャンクを記録し、レンディションの全チャンクが揃ったら公開する"""
+    r = get_sync_redis()
+    key = chunks_key(video_id, rendition_name)
+    pipe = r.pipeline()
+    pipe.hset(key, str(index), json.dumps(segments))
+    pipe.expire(key, 24 * 3600)
+    pipe.hlen(key)
+    done = pipe.execute()[-1]
+    if done < chunk_count:
+        return
+    
+    chunks = sorted((int(i), json.loads(v)) for i, v in r.hgetall(key).items())
+    put_playlist(
+        storage,
+        f"{hls_base_key(video_id)}/stream_{rendition_name}.m3u8",
+        ffmpeg.media_playlist([segments for _, segments in chunks]),
+    )
+    publish_rendition(storage, video_id, rendition_name, VideoStatus.PARTIALLY_READY)
+
+
+def make_thumbnail(storage, input_url: str, video_id: str, tmpdir: str) -> str | None:
+    """サムネイルを生成してアップロードし、キーを返す（失敗時は None）"""
+    with stage("thumbnail") as stats:
+        thumbnail_path = os.path.join(tmpdir, "thumbnail.jpg")
+        try:
+            ffmpeg.run(ffmpeg.thumbnail_command(input_url, thumbnail_path))
             thumbnail_key = f"videos/{video_id}/thumbnail.jpg"
-            if os.path.exists(thumbnail_path):
-                s3.upload_file(thumbnail_path, settings.minio_bucket, thumbnail_key, ExtraArgs={"ContentType": "image/jpeg"})
-            
-            # DB更新
-            video.hls_master_url = f"http://{settings.minio_endpoint}/{settings.minio_bucket}/{hls_base_key}/master.m3u8"
-            video.thumbnail_url = f"http://{settings.minio_endpoint}/{settings.minio_bucket}/{thumbnail_key}"
-            video.duration = duration
-            video.status = VideoStatus.READY
+            storage.upload_file(thumbnail_path, thumbnail_key, "image/jpeg")
+        except RuntimeError:
+            return None
+        if stats:
+            stats.add_output(os.path.getsize(thumbnail_path))
+        return thumbnail_key
+
+
+def encode_chunk(
+    storage,
+    input_url: str,
+    video_id: str,
+    rendition: dict,
+    index: int,
+    start: float,
+    duration: float | None,
+    cancelled: Callable[[], bool] | None = None,
+) -> list:
+    """1レンディション・1チャンク分をエンコード・アップロードし、セグメント一覧を返す"""
+    with stage("encode", rendition=rendition["name"], chunk=index), tempfile.TemporaryDirectory() as tmpdir:
+        cmd = ffmpeg.chunk_command(
+            input_url, tmpdir, rendition, index, start, duration, preset=settings.transcode_x264_preset
+        )
+        encode_and_upload(storage, cmd, tmpdir, hls_base_key(video_id), cancelled=cancelled)
+        
+        # チャンクのプレイリストはセグメント一覧だけ返し、結合は finalize で行う
+        playlist_path = os.path.join(tmpdir, f"chunk_{ffmpeg.chunk_name(rendition, index)}.m3u8")
+        with open(playlist_path) as f:
+            return ffmpeg.parse_media_playlist(f.read())
+
+
+def write_playlists(
+    storage,
+    video_id: str,
+    segments_by_rendition: dict[str, list[tuple[int, list]]],
+    published: set[str] = frozenset(),
+) -> str:
+    """チャンクのセグメントからメディアプレイリスト（published を除く）とマスターを書き出し、マスターのキーを返す"""
+    with stage("playlists"):
+        for name, indexed in segments_by_rendition.items():
+            if name in published:
+                continue
+            put_playlist(
+                storage,
+                f"{hls_base_key(video_id)}/stream_{name}.m3u8",
+                ffmpeg.media_playlist([segments for _, segments in sorted(indexed)]),
+            )
+        master_key = f"{hls_base_key(video_id)}/master.m3u8"
+        put_playlist(storage, master_key, ffmpeg.master_playlist([ffmpeg.RENDITIONS_BY_NAME[n] for n in segments_by_rendition]))
+    return master_key
+
+
+def mark_failed(video_id: str) -> None:
+    """動画を変換失敗にする"""
+    db = get_sync_db()
+    try:
+        video = db.query(Video).filter(Video.id == UUID(video_id)).with_for_update().first()
+        if video and not owns_output(db, video):
+            # 重複排除済みのため失敗扱いにしない
+            discard_superseded_output(db, video)
+        elif video:
+            video.status = VideoStatus.FAILED
+            # 変換中のメディアを手放し、同じ内容の次のアップロードが引き継げるようにする
+            if video.asset_id:
+                asset = db.query(MediaAsset).filter(MediaAsset.id == video.asset_id).with_for_update().first()
+                if asset and asset.status == MediaAssetStatus.PROCESSING:
+                    asset.ref_count -= 1
+                    video.asset_id = None
             db.commit()
+            invalidate_video_cache(video)
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=3)
+def transcode_video(self, video_id: str):
+    """動画をHLS形式に変換
+
+    probe とサムネイル生成を行ったあと、レンディション（長尺動画はさらに
+    チャンク）ごとのエンコードを chord で並列に実行し、finalize_transcode で
+    プレイリストを書き出す。重複判定（元動画全体のハッシュ計算）は初回再生までの
+    時間を延ばさないよう deduplicate_video で並行して行う。
+    """
+    storage = get_storage()
+    
+    try:
+        if self.request.retries == 0:
+            deduplicate_video.delay(video_id)
+        elif is_cancelled(video_id):
+            return {"status": "deduplicated", "video_id": video_id}
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_url = source_url(storage, video_id)
+            
+            # 動画の長さ・解像度取得
+            with stage("probe"):
+                info = ffmpeg.probe(input_url)
             
-            return {"status": "success", "video_id": video_id}
+            # サムネイル生成（失敗しても変換は続行）
+            thumbnail_key = make_thumbnail(storage, input_url, video_id, tmpdir)
+        
+        # レンディション × チャンクごとに並列エンコード → 完了後にまとめる
+        renditions = ffmpeg.select_renditions(info["height"])
+        chunked = info["duration"] >= settings.transcode_chunked_min_duration_seconds
+        chunks = ffmpeg.plan_chunks(info["duration"], settings.transcode_chunk_seconds if chunked else None)
+        header = []
+        if settings.progressive_publish:
+            # 最低画質を最初に、分割せず逐次公開しながら変換する。
+            # セグメントを順に公開するため分割できず、長い動画では他の（分割した）画質より
+            # 遅く終わって finalize を待たせるが、最初の再生までの時間を優先する
+            header.append(transcode_progressive.s(video_id, renditions[-1]["name"]))
+            renditions = renditions[:-1]
+        header += [
+            transcode_chunk.s(video_id, r["name"], index, start, duration, len(chunks))
+            for r in renditions
+            for index, (start, duration) in enumerate(chunks)
+        ]
+        finalize = finalize_transcode.s(video_id, int(info["duration"]), thumbnail_key)
+        chord(header)(finalize.on_error(transcode_failed.si(video_id)))
+        
+        return {"status": "dispatched", "video_id": video_id, "tasks": len(header)}
             
     except Exception as e:
-        # エラー時
-        video = db.query(Video).filter(Video.id == UUID(video_id)).first()
-        if video:
-            video.status = VideoStatus.FAILED
-            db.commit()
+        if self.request.retries >= self.max_retries:
+            mark_failed(video_id)
         raise self.retry(exc=e, countdown=60)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def transcode_progressive(self, video_id: str, rendition_name: str):
+    """レンディションを EVENT プレイリストとして逐次公開しながら変換
+
+    最初のセグメントが公開された時点で動画を PLAYABLE にし、
+    以降はセグメントが増えるたびにプレイリストを更新する。
+    """
+    storage = get_storage()
+    rendition = ffmpeg.RENDITIONS_BY_NAME[rendition_name]
+    
+    try:
+        with stage("encode", rendition=rendition_name, chunk=0, progressive=True), tempfile.TemporaryDirectory() as tmpdir:
+            input_url = source_url(storage, video_id)
+            cmd = ffmpeg.chunk_command(
+                input_url, tmpdir, rendition, 0, 0.0, None, event=True, preset=settings.transcode_x264_preset
+            )
+            local_playlist = f"chunk_{ffmpeg.chunk_name(rendition, 0)}.m3u8"
+            encode_and_upload(
+                storage, cmd, tmpdir, hls_base_key(video_id),
+                live_playlist=(local_playlist, f"stream_{rendition_name}.m3u8"),
+                on_first_publish=lambda: publish_rendition(storage, video_id, rendition_name, VideoStatus.PLAYABLE),
+                cancelled=lambda: is_cancelled(video_id),
+            )
+            with open(os.path.join(tmpdir, local_playlist)) as f:
+                segments = ffmpeg.parse_media_playlist(f.read())
+        
+        publish_rendition(storage, video_id, rendition_name, VideoStatus.PARTIALLY_READY)
+        return {"rendition": rendition_name, "index": 0, "segments": segments}
+    
+    except TranscodeCancelled:
+        return {"rendition": rendition_name, "index": 0, "segments": [], "cancelled": True}
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def transcode_chunk(
+    self,
+    video_id: str,
+    rendition_name: str,
+    index: int,
+    start: float,
+    duration: float | None,
+    chunk_count: int = 1,
+):
+    """1レンディション・1チャンク分をHLSに変換し、完成したセグメントから順にアップロード"""
+    storage = get_storage()
+    rendition = ffmpeg.RENDITIONS_BY_NAME[rendition_name]
+    
+    try:
+        if is_cancelled(video_id):
+            raise TranscodeCancelled()
+        input_url = source_url(storage, video_id)
+        segments = encode_chunk(
+            storage, input_url, video_id, rendition, index, start, duration, cancelled=lambda: is_cancelled(video_id)
+        )
+        
+        # 途中公開: レンディションが揃った時点でマスターに追加する
+        if settings.progressive_publish:
+            record_chunk(storage, video_id, rendition_name, index, chunk_count, segments)
+        
+        return {"rendition": rendition_name, "index": index, "segments": segments}
+    
+    except TranscodeCancelled:
+        return {"rendition": rendition_name, "index": index, "segments": [], "cancelled": True}
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+@celery_app.task
+def finalize_transcode(chunks: list[dict], video_id: str, duration: int, thumbnail_key: str | None):
+    """未公開のメディアプレイリストと最終的なマスタープレイリストを書き出し、動画を READY にする"""
+    storage = get_storage()
+    db = get_sync_db()
+    try:
+        video = db.query(Video).filter(Video.id == UUID(video_id)).with_for_update().first()
+        if not video:
+            raise ValueError(f"Video not found: {video_id}")
+        if not owns_output(db, video):
+            discard_superseded_output(db, video)
+            return {"status": "deduplicated", "video_id": video_id}
+        
+        segments_by_rendition: dict[str, list[tuple[int, list]]] = {}
+        for chunk in chunks:
+            segments_by_rendition.setdefault(chunk["rendition"], []).append((chunk["index"], chunk["segments"]))
+        
+        # 途中公開済みのレンディションはプレイリストを書き換えない
+        master_key = write_playlists(storage, video_id, segments_by_rendition, set(video.ready_renditions or []))
+        names = list(segments_by_rendition)
+        
+        # DB更新
+        video.ready_renditions = names
+        video.hls_master_url = storage.public_url(master_key)
+        if thumbnail_key:
+            video.thumbnail_url = storage.public_url(thumbnail_key)
+        video.duration = duration
+        advance_status(video, VideoStatus.READY)
+        
+        # 以降の同一内容のアップロードはこの出力を再利用する
+        if video.asset_id:
+            asset = db.query(MediaAsset).filter(MediaAsset.id == video.asset_id).first()
+            if asset:
+                asset.status = MediaAssetStatus.READY
+                asset.hls_master_url = video.hls_master_url
+                asset.thumbnail_url = video.thumbnail_url
+                asset.ready_renditions = names
+                asset.duration = duration
+        db.commit()
+        invalidate_video_cache(video)
     finally:
         db.close()
+    
+    get_sync_redis().delete(*(chunks_key(video_id, name) for name in segments_by_rendition))
+    return {"status": "success", "video_id": video_id}
+
+
+@celery_app.task(bind=True, max_retries=3)
+def deduplicate_video(self, video_id: str):
+    """元動画の内容ハッシュで重複を判定し、変換済みの同一メディアがあれば紐付ける
+
+    判定に失敗しても変換は続くため、リトライを使い切ったら重複排除を諦める。
+    """
+    storage = get_storage()
+    try:
+        with stage("dedup"):
+            deduplicated = link_existing_asset(storage, video_id)
+        return {"status": "deduplicated" if deduplicated else "unique", "video_id": video_id}
+    except Exception as e:
+        raise self.retry(exc=e, countdown=60)
+
+
+@celery_app.task
+def transcode_failed(video_id: str):
+    """いずれかのレンディションが失敗した場合のエラーコールバック"""
+    mark_failed(video_id)
+
+
+@celery_app.task
+def delete_media_objects(source_key: str | None, storage_prefix: str):
+    """参照されなくなった元動画と変換結果を削除"""
+    storage = get_storage()
+    if source_key:
+        storage.delete(source_key)
+    deleted = storage.delete_prefix(storage_prefix)
+    return {"prefix": storage_prefix, "deleted": deleted}
@@ -0,0 +1 @@
+# Benchmarks（docker-compose の db/redis を使う。例: python -m benchmarks.search）
@@ -0,0 +1,120 @@
+"""いいねの同時実行テスト: 並列リクエスト下で like_count が正確に保たれるか確認する
+
+    python -m benchmarks.likes --users 1000 --concurrency 200
+
+--users 人分のユーザーを作成し、全員が同じ動画に同時に PUT（2回ずつ）→ DELETE（2回ずつ）を
+送る。各フェーズ後に videos.like_count と likes の行数が一致するかを検証する。
+API は ASGI で直接呼び出す（db/redis は docker-compose のものを使う）。
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import httpx
+from sqlalchemy import create_engine, text
+
+from app.core import create_access_token
+from app.core.config import settings
+from app.main import app
+
+SEED_EMAIL_PREFIX = "bench-likes-"
+
+
+def seed(conn, users: int) -> tuple[str, list[str]]:
+    """テスト用のユーザー・チャンネル・動画を作成"""
+    user_ids = [str(row.id) for row in conn.execute(text("""
+        INSERT INTO users (id, email, password_hash, display_name, role, status, created_at)
+        SELECT gen_random_uuid(), :prefix || i || '@example.com', '-', 'bench', 'viewer', 'active', now()
+        FROM generate_series(1, :count) AS i
+        RETURNING id
+    """), {"prefix": SEED_EMAIL_PREFIX, "count": users})]
+    channel_id = conn.execute(text("""
+        INSERT INTO channels (id, owner_user_id, name, subscriber_count, created_at)
+        VALUES (gen_random_uuid(), :user_id, 'bench-likes', 0, now())
+        RETURNING id
+    """), {"user_id": user_ids[0]}).scalar()
+    video_id = conn.execute(text("""
+        INSERT INTO videos (
+            id, channel_id, title, tags, visibility, status,
+            view_count, like_count, comment_count, published_at, created_at
+        )
+        VALUES (gen_random_uuid(), :channel_id, 'bench-likes', '{}', 'public', 'published', 0, 0, 0, now(), now())
+        RETURNING id
+    """), {"channel_id": channel_id}).scalar()
+    return str(video_id), user_ids
+
+
+def cleanup(conn, video_id: str) -> None:
+    conn.execute(text("DELETE FROM likes WHERE video_id = :id"), {"id": video_id})
+    conn.execute(text("DELETE FROM videos WHERE id = :id"), {"id": video_id})
+    conn.execute(text("DELETE FROM channels WHERE name = 'bench-likes'"))
+    conn.execute(text("DELETE FROM users WHERE email LIKE :prefix"), {"prefix": SEED_EMAIL_PREFIX + "%"})
+
+
+def counts(conn, video_id: str) -> dict:
+    return {
+        "like_count": conn.execute(text("SELECT like_count FROM videos WHERE id = :id"), {"id": video_id}).scalar(),
+        "likes_rows": conn.execute(text("SELECT count(*) FROM likes WHERE video_id = :id"), {"id": video_id}).scalar(),
+    }
+
+
+async def fire(method: str, video_id: str, tokens: list[str], concurrency: int) -> dict:
+    """全ユーザーから同時にリクエストを送り、ステータスコードの分布と所要時間を返す"""
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: dict[int, int] = {}
+
+    async def send(client: httpx.AsyncClient, token: str) -> None:
+        async with semaphore:
+            response = await client.request(
+                method, f"/videos/{video_id}/like", headers={"Authorization": f"Bearer {token}"}
+            )
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        # 各ユーザー2回ずつ送って冪等性も確認する
+        await asyncio.gather(*(send(client, token) for token in tokens + tokens))
+        elapsed = time.perf_counter() - start
+    return {"statuses": statuses, "seconds": round(elapsed, 2)}
+
+
+async def run(engine, video_id: str, tokens: list[str], concurrency: int) -> dict:
+    """いいね → 解除の順に実行し、各フェーズ後のカウンタを検証する"""
+    # API の非同期エンジンはイベントループに紐付くため、全フェーズを同じループで実行する
+    results = {"users": len(tokens)}
+    for method, expected in (("PUT", len(tokens)), ("DELETE", 0)):
+        phase = await fire(method, video_id, tokens, concurrency)
+        with engine.connect() as conn:
+            phase.update(counts(conn, video_id))
+        phase["exact"] = phase["like_count"] == phase["likes_rows"] == expected
+        results[method] = phase
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        video_id, user_ids = seed(conn, args.users)
+    tokens = [create_access_token(data={"sub": user_id}) for user_id in user_ids]
+
+    try:
+        results = asyncio.run(run(engine, video_id, tokens, args.concurrency))
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    finally:
+        with engine.begin() as conn:
+            cleanup(conn, video_id)
+
+    ok = all(results[method]["exact"] and set(results[method]["statuses"]) == {200} for method in ("PUT", "DELETE"))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""API の負荷試験: 一覧・検索・詳細・視聴・いいね・コメントの混在トラフィック
+
+    python -m benchmarks.load --duration 60 --concurrency 50
+    python -m benchmarks.load --url http://localhost:8000 --output results/after.json --compare results/before.json
+
+既定では API を ASGI で直接呼び出す（db/redis は docker-compose のものを使う）。
+--url を指定すると起動中のサーバーに送る（トークンは同じ SECRET_KEY で発行するため、
+サーバーと設定を揃えること）。対象の動画・ユーザーは DB から抽出するので、
+事前に benchmarks.seed でデータを投入しておく。
+
+エンドポイントごとのスループットと p50/p95/p99 を JSON で保存し、--compare で
+以前の結果との差分を表示できる。
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+import httpx
+from sqlalchemy import create_engine, text
+
+from app.core import create_access_token
+from app.core.config import settings
+from .search import QUERIES
+
+# シナリオ名と重み（視聴系の読み取りが大半を占める想定）
+DEFAULT_MIX = "list=30,search=10,detail=35,view=15,like=6,comment=4"
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"不明なシナリオです: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def sample_targets(database_url: str, videos: int, users: int) -> tuple[list[str], list[str]]:
+    """リクエスト対象の公開動画とユーザーを DB から抽出"""
+    def sample(conn, table: str, where: str, limit: int) -> list[str]:
+        # 大きいテーブルは先頭に偏らないようページ単位でサンプリングし、足りなければ全体から取る
+        ids = [str(row.id) for row in conn.execute(
+            text(f"SELECT id FROM {table} TABLESAMPLE SYSTEM (10) WHERE {where} LIMIT :limit"), {"limit": limit}
+        )]
+        if len(ids) < limit:
+            ids = [str(row.id) for row in conn.execute(
+                text(f"SELECT id FROM {table} WHERE {where} LIMIT :limit"), {"limit": limit}
+            )]
+        return ids
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        video_ids = sample(conn, "videos", "visibility = 'public' AND status = 'published'", videos)
+        user_ids = sample(conn, "users", "status = 'active'", users)
+    engine.dispose()
+    return video_ids, user_ids
+
+
+class Targets:
+    def __init__(self, video_ids: list[str], tokens: list[str], rng: random.Random):
+        self.video_ids = video_ids
+        self.tokens = tokens
+        self.rng = rng
+
+    def video(self) -> str:
+        return self.rng.choice(self.video_ids)
+
+    def auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+
+async def scenario_list(client: httpx.AsyncClient, targets: Targets) -> httpx.Response:
+    # 先頭数ページに集中させる
+    page = min(int(targets.rng.expovariate(1.0)) + 1, 10)
+    sort = targets.rng.choice(["new", "popular"])
+    return await client.get("/videos", params={"page": page, "sort": sort})
+
+
+async def scenario_search(client: httpx.AsyncClient, targets: Targets) -> httpx.Response:
+    return await client.get("/videos", params={"q": targets.rng.choice(QUERIES), "with_total": "false"})
+
+
+async def scenario_detail(client: httpx.AsyncClient, targets: Targets) -> httpx.Response:
+    return await client.get(f"/videos/{targets.video()}")
+
+
+async def scenario_view(client: httpx.AsyncClient, targets: Targets) -> httpx.Response:
+    return await client.post(f"/videos/{targets.video()}/view")
+
+
+async def scenario_like(client: httpx.AsyncClient, targets: Targets) -> httpx.Response:
+    method = "PUT" if targets.rng.random() < 0.8 else "DELETE"
+    return await client.request(method, f"/videos/{targets.video()}/like", headers=targets.auth())
+
+
+async def scenario_comment(client: httpx.AsyncClient, targets: Targets) -> httpx.Response:
+    return await client.post(
+        f"/videos/{targets.video()}/comments", json={"body": "負荷試験のコメント"}, headers=targets.auth()
+    )
+
+
+SCENARIOS = {
+    "list": scenario_list,
+    "search": scenario_search,
+    "detail": scenario_detail,
+    "view": scenario_view,
+    "like": scenario_like,
+    "comment": scenario_comment,
+}
+
+
+def percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))], 2)
+    return {"p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(samples[-1], 2)}
+
+
+async def run_load(client: httpx.AsyncClient, targets: Targets, mix: dict[str, float], duration: float, concurrency: int) -> dict:
+    """duration 秒の間 concurrency 並列でシナリオを重み付きで実行し、シナリオごとに集計する"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples: dict[str, list[float]] = {name: [] for name in names}
+    statuses: dict[str, dict[int, int]] = {name: {} for name in names}
+    errors: dict[str, int] = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            name = targets.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await SCENARIOS[name](client, targets)
+            except httpx.HTTPError:
+                errors[name] += 1
+                continue
+            samples[name].append((time.perf_counter() - start) * 1000)
+            statuses[name][response.status_code] = statuses[name].get(response.status_code, 0) + 1
+            if response.status_code >= 500:
+                errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    endpoints = {
+        name: {
+            "requests": len(samples[name]),
+            "rps": round(len(samples[name]) / elapsed, 1),
+            "errors": errors[name],
+            "statuses": statuses[name],
+            **percentiles(samples[name]),
+        }
+        for name in names
+    }
+    every = [sample for name in names for sample in samples[name]]
+    return {
+        "seconds": round(elapsed, 2),
+        "total": {"requests": len(every), "rps": round(len(every) / elapsed, 1), **percentiles(every)},
+        "endpoints": endpoints,
+    }
+
+
+async def run(args, targets: Targets) -> dict:
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        from app.main import app
+        transport, base_url = httpx.ASGITransport(app=app), "http://bench"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=30, limits=limits) as client:
+        # ウォームアップ（コネクションプール・キャッシュ）は集計しない
+        if args.warmup > 0:
+            await run_load(client, targets, args.mix, args.warmup, args.concurrency)
+        return await run_load(client, targets, args.mix, args.duration, args.concurrency)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> dict:
+    """以前の結果からの変化率（%）。レイテンシは正の値が悪化、rps は負の値が悪化"""
+    change = lambda new, old: round((new - old) / old * 100, 1) if old else None
+    diff = {}
+    for name, result in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before or not result.get("requests") or not before.get("requests"):
+            continue
+        diff[name] = {
+            key: change(result[key], before[key]) for key in ("rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+    return diff
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--url", help="起動中のサーバーの URL（省略時は ASGI で直接呼び出す）")
+    parser.add_argument("--duration", type=float, default=60)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"シナリオの重み（既定: {DEFAULT_MIX}）")
+    parser.add_argument("--videos", type=int, default=10_000, help="対象にする動画数")
+    parser.add_argument("--users", type=int, default=1_000, help="いいね・コメントに使うユーザー数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="結果の JSON の保存先")
+    parser.add_argument("--compare", type=Path, help="比較する以前の結果の JSON")
+    args = parser.parse_args()
+
+    video_ids, user_ids = sample_targets(args.database_url, args.videos, args.users)
+    if not video_ids or not user_ids:
+        parser.error("対象の動画・ユーザーがありません。先に python -m benchmarks.seed を実行してください")
+    tokens = [create_access_token(data={"sub": user_id}) for user_id in user_ids]
+    targets = Targets(video_ids, tokens, random.Random(args.seed))
+
+    results = {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "target": args.url or "asgi",
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "videos": len(video_ids),
+        "users": len(user_ids),
+        **asyncio.run(run(args, targets)),
+    }
+    if args.compare:
+        results["change_pct"] = compare(results, json.loads(args.compare.read_text()))
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""ログイン集中時の読み取りレイテンシのベンチマーク
+
+    python -m benchmarks.login_storm --logins 500 --login-concurrency 100 --reads 2000
+
+GET /videos のレイテンシ（p50/p95/p99）を、ログインなしの状態と、bcrypt の検証を伴う
+ログインを大量に同時送信している状態で比較する。ハッシュ計算がイベントループを
+ブロックしていれば、ログイン集中中の読み取りの p99 が大きく悪化する。
+API は ASGI で直接呼び出す（db/redis は docker-compose のものを使う）。
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.core.security import pwd_context
+from app.main import app
+
+SEED_EMAIL = "bench-login@example.com"
+SEED_PASSWORD = "bench-password"
+
+
+def seed(conn) -> None:
+    conn.execute(text("""
+        INSERT INTO users (id, email, password_hash, display_name, role, status, created_at)
+        VALUES (gen_random_uuid(), :email, :password_hash, 'bench', 'viewer', 'active', now())
+        ON CONFLICT (email) DO UPDATE SET password_hash = excluded.password_hash
+    """), {"email": SEED_EMAIL, "password_hash": pwd_context.hash(SEED_PASSWORD)})
+
+
+def percentiles(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))], 2)
+    return {"count": len(samples), "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99), "max_ms": round(samples[-1], 2)}
+
+
+async def read_loop(client: httpx.AsyncClient, reads: int, concurrency: int) -> list[float]:
+    """GET /videos を concurrency 並列で reads 回送り、レイテンシ（ms）を返す"""
+    samples: list[float] = []
+    remaining = iter(range(reads))
+
+    async def worker() -> None:
+        for _ in remaining:
+            start = time.perf_counter()
+            await client.get("/videos", params={"with_total": "false"})
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def login_storm(client: httpx.AsyncClient, logins: int, concurrency: int) -> dict[int, int]:
+    """ログインを同時に送り、ステータスコードの分布を返す"""
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses: dict[int, int] = {}
+
+    async def login() -> None:
+        async with semaphore:
+            response = await client.post(
+                "/auth/login", data={"username": SEED_EMAIL, "password": SEED_PASSWORD}
+            )
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return statuses
+
+
+async def run(args) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        # ウォームアップ（コネクションプール・キャッシュ）
+        await read_loop(client, 50, args.read_concurrency)
+
+        baseline = await read_loop(client, args.reads, args.read_concurrency)
+
+        start = time.perf_counter()
+        storm_reads, statuses = await asyncio.gather(
+            read_loop(client, args.reads, args.read_concurrency),
+            login_storm(client, args.logins, args.login_concurrency),
+        )
+        elapsed = time.perf_counter() - start
+
+    return {
+        "bcrypt_rounds": settings.bcrypt_rounds,
+        "password_hash_workers": settings.password_hash_workers,
+        "password_hash_queue_size": settings.password_hash_queue_size,
+        "baseline_reads": percentiles(baseline),
+        "storm_reads": percentiles(storm_reads),
+        "logins": {"statuses": statuses, "seconds": round(elapsed, 2)},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--login-concurrency", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--read-concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        seed(conn)
+
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""動画検索のベンチマーク: 旧 ILIKE '%q%' 方式と全文検索（tsvector + pg_trgm）の比較
+
+    python -m benchmarks.search --rows 1000000 --iterations 50
+
+--rows に満たない場合はベンチマーク用チャンネルに合成データを投入する。
+トライグラムが効かない短いクエリ（新着に限った部分一致になるもの）は short_queries に別途集計する。
+"""
+import argparse
+import json
+import statistics
+import time
+from sqlalchemy import create_engine, select, or_, text
+
+from app.core.config import settings
+from app.core.search import apply_search, search_rank, MIN_TRIGRAM_QUERY_LENGTH
+from app.models import Video
+
+QUERIES = ["猫", "東京", "料理 レシピ", "ゲーム実況", "tutorial", "旅行 vlog", "ピアノ"]
+SHORT_QUERIES = [q for q in QUERIES if len(q) < MIN_TRIGRAM_QUERY_LENGTH]
+
+WORDS = [
+    "猫", "犬", "料理", "レシピ", "ゲーム実況", "旅行", "vlog", "ピアノ", "ギター", "東京",
+    "大阪", "ラーメン", "キャンプ", "tutorial", "python", "music", "live", "まとめ", "解説", "初心者",
+]
+
+SEED_USER_EMAIL = "bench-search@example.com"
+
+
+def seed(conn, rows: int) -> None:
+    """合成データを投入（不足分のみ）"""
+    existing = conn.execute(text("SELECT count(*) FROM videos")).scalar()
+    if existing >= rows:
+        return
+
+    user_id = conn.execute(text("""
+        INSERT INTO users (id, email, password_hash, display_name, role, status, created_at)
+        VALUES (gen_random_uuid(), :email, '-', 'bench', 'creator', 'active', now())
+        ON CONFLICT (email) DO UPDATE SET email = excluded.email
+        RETURNING id
+    """), {"email": SEED_USER_EMAIL}).scalar()
+    channel_id = conn.execute(text("""
+        INSERT INTO channels (id, owner_user_id, name, subscriber_count, created_at)
+        VALUES (gen_random_uuid(), :user_id, 'bench', 0, now())
+        RETURNING id
+    """), {"user_id": user_id}).scalar()
+
+    # タイトル・説明は単語を連結して生成（search_vector はトリガーで埋まる）
+    conn.execute(text("""
+        INSERT INTO videos (
+            id, channel_id, title, description, tags, visibility, status,
+            view_count, like_count, comment_count, published_at, created_at
+        )
+        SELECT
+            gen_random_uuid(), :channel_id,
+            w[1 + (i * 7) % n] || w[1 + (i * 13) % n] || ' ' || w[1 + (i * 3) % n] || ' #' || i,
+            repeat(w[1 + (i * 11) % n] || 'の' || w[1 + (i * 5) % n] || 'を紹介します。', 3),
+            ARRAY[w[1 + i % n], w[1 + (i * 17) % n]],
+            'public', 'published',
+            (random() * 100000)::int, (random() * 1000)::int, (random() * 100)::int,
+            now() - (i || ' seconds')::interval, now()
+        FROM generate_series(1, :count) AS i,
+             (SELECT CAST(:words AS text[]) AS w, cardinality(CAST(:words AS text[])) AS n) AS vocab
+    """), {"channel_id": channel_id, "count": rows - existing, "words": WORDS})
+    conn.execute(text("ANALYZE videos"))
+
+
+def ilike_query(q: str):
+    """旧実装の検索クエリ"""
+    return select(Video).where(
+        Video.visibility == "public",
+        Video.status == "published",
+        or_(Video.title.ilike(f"%{q}%"), Video.description.ilike(f"%{q}%")),
+    ).order_by(Video.published_at.desc()).limit(20)
+
+
+def fulltext_query(q: str):
+    """全文検索のクエリ"""
+    query = select(Video).where(Video.visibility == "public", Video.status == "published")
+    return apply_search(query, q).order_by(search_rank(q).desc(), Video.id.desc()).limit(20)
+
+
+def measure(conn, build, iterations: int, queries: list[str] = QUERIES) -> dict:
+    """クエリ群を繰り返し実行してレイテンシ（ms）を集計"""
+    samples = []
+    for _ in range(iterations):
+        for q in queries:
+            query = build(q)
+            start = time.perf_counter()
+            conn.execute(query).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 2),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 2),
+        "max_ms": round(samples[-1], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    with engine.begin() as conn:
+        seed(conn, args.rows)
+
+    with engine.connect() as conn:
+        results = {
+            "rows": conn.execute(text("SELECT count(*) FROM videos")).scalar(),
+            "ilike": measure(conn, ilike_query, args.iterations),
+            "fulltext": measure(conn, fulltext_query, args.iterations),
+            "short_queries": {
+                "queries": SHORT_QUERIES,
+                "ilike": measure(conn, ilike_query, args.iterations, SHORT_QUERIES),
+                "fulltext": measure(conn, fulltext_query, args.iterations, SHORT_QUERIES),
+            },
+        }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
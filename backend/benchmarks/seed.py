@@ -0,0 +1,149 @@
+"""負荷試験用の合成データ生成（COPY で一括投入）
+
+    python -m benchmarks.seed --videos 1000000 --comments 10000000 --likes 50000000
+
+ユーザー・チャンネル・動画・コメント・いいねを asyncpg の COPY（バイナリ）で投入する。
+動画ごとのいいね・コメント数は偏りのある分布（少数の動画に集中）で決め、
+videos の like_count / comment_count は投入した行数と一致させる。
+--seed が同じなら同じ分布になる（ID・メールアドレスは実行ごとに異なる）。
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+import asyncpg
+
+from app.core.config import settings
+from app.models import User, Channel, Video, Comment, Like
+from .search import WORDS
+
+COMMENT_BODIES = ["最高です", "参考になりました", "続きが見たい", "いい動画", "わかりやすい", "すごい", "懐かしい", "笑った"]
+
+
+def distribute(total: int, buckets: int, cap: int, rng: random.Random) -> list[int]:
+    """total を buckets 個に偏りをつけて配分する（各値は cap 以下）"""
+    if buckets == 0 or total == 0:
+        return [0] * buckets
+    weights = [rng.paretovariate(1.2) for _ in range(buckets)]
+    scale = total / sum(weights)
+    counts = [min(cap, int(weight * scale)) for weight in weights]
+    # 切り捨て・上限で足りない分を上限に達していない動画へ順に足す
+    shortfall = total - sum(counts)
+    index = 0
+    while shortfall > 0 and index < buckets * 2:
+        i = index % buckets
+        room = min(cap - counts[i], shortfall, max(1, total // buckets))
+        counts[i] += room
+        shortfall -= room
+        index += 1
+    return counts
+
+
+async def copy(conn: asyncpg.Connection, model, columns: tuple[str, ...], records, total: int) -> None:
+    """レコードを COPY し、件数と速度を表示"""
+    start = time.perf_counter()
+    await conn.copy_records_to_table(model.__table__.name, columns=columns, records=records)
+    elapsed = time.perf_counter() - start
+    print(f"{model.__table__.name}: {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)", flush=True)
+
+
+async def seed(args) -> dict:
+    rng = random.Random(args.seed)
+    run = uuid.uuid4().hex[:8]
+    now = datetime.utcnow()
+
+    user_ids = [uuid.uuid4() for _ in range(args.users)]
+    channel_ids = [uuid.uuid4() for _ in range(args.channels)]
+    video_ids = [uuid.uuid4() for _ in range(args.videos)]
+    like_counts = distribute(args.likes, args.videos, args.users, rng)
+    comment_counts = distribute(args.comments, args.videos, args.comments, rng)
+
+    def users():
+        for i, user_id in enumerate(user_ids):
+            role = "creator" if i < args.channels else "viewer"
+            yield (user_id, f"seed-{run}-{i}@example.com", "-", f"seed user {i}", role, "active", now, now)
+
+    def channels():
+        for i, channel_id in enumerate(channel_ids):
+            yield (channel_id, user_ids[i % len(user_ids)], f"seed channel {i}", rng.randrange(100_000), now, now)
+
+    def videos():
+        n = len(WORDS)
+        for i, video_id in enumerate(video_ids):
+            published_at = now - timedelta(seconds=i * 30)
+            yield (
+                video_id, channel_ids[i % len(channel_ids)],
+                f"{WORDS[i * 7 % n]}{WORDS[i * 13 % n]} {WORDS[i * 3 % n]} #{i}",
+                f"{WORDS[i * 11 % n]}の{WORDS[i * 5 % n]}を紹介します。",
+                [WORDS[i % n], WORDS[i * 17 % n]],
+                "public" if rng.random() < args.public_ratio else "unlisted", "published",
+                rng.randrange(1, 3600),
+                int(like_counts[i] * rng.uniform(20, 200)), like_counts[i], comment_counts[i],
+                published_at, published_at, published_at,
+            )
+
+    def comments():
+        for i, video_id in enumerate(video_ids):
+            for _ in range(comment_counts[i]):
+                yield (
+                    uuid.uuid4(), video_id, user_ids[rng.randrange(len(user_ids))],
+                    rng.choice(COMMENT_BODIES), "active", now - timedelta(seconds=rng.randrange(86400 * 30)),
+                )
+
+    def likes():
+        # 動画ごとに連続したユーザーを選ぶ（主キー (user_id, video_id) が重複しない）
+        for i, video_id in enumerate(video_ids):
+            offset = rng.randrange(len(user_ids))
+            for k in range(like_counts[i]):
+                yield (user_ids[(offset + k) % len(user_ids)], video_id, now)
+
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        start = time.perf_counter()
+        await copy(conn, User, ("id", "email", "password_hash", "display_name", "role", "status", "created_at", "updated_at"), users(), args.users)
+        await copy(conn, Channel, ("id", "owner_user_id", "name", "subscriber_count", "created_at", "updated_at"), channels(), args.channels)
+        await copy(conn, Video, (
+            "id", "channel_id", "title", "description", "tags", "visibility", "status", "duration",
+            "view_count", "like_count", "comment_count", "published_at", "created_at", "updated_at",
+        ), videos(), args.videos)
+        await copy(conn, Comment, ("id", "video_id", "user_id", "body", "status", "created_at"), comments(), sum(comment_counts))
+        await copy(conn, Like, ("user_id", "video_id", "created_at"), likes(), sum(like_counts))
+        for model in (User, Channel, Video, Comment, Like):
+            await conn.execute(f"ANALYZE {model.__table__.name}")
+        elapsed = time.perf_counter() - start
+    finally:
+        await conn.close()
+
+    return {
+        "run": run,
+        "users": args.users,
+        "channels": args.channels,
+        "videos": args.videos,
+        "comments": sum(comment_counts),
+        "likes": sum(like_counts),
+        "seconds": round(elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--channels", type=int, default=10_000)
+    parser.add_argument("--videos", type=int, default=1_000_000)
+    parser.add_argument("--comments", type=int, default=10_000_000)
+    parser.add_argument("--likes", type=int, default=50_000_000)
+    parser.add_argument("--public-ratio", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.channels > args.users:
+        parser.error("--channels は --users 以下にしてください（チャンネルの所有者をユーザーから割り当てるため）")
+
+    print(json.dumps(asyncio.run(seed(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
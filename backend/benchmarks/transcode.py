@@ -0,0 +1,163 @@
+"""動画変換のベンチマーク: ステージごとの時間・CPU・メモリ・一時ディスク・出力サイズ
+
+    python -m benchmarks.transcode --sources 1280x720x60,1920x1080x300 --presets veryfast,medium
+
+ffmpeg の testsrc2 / sine で合成した元動画を LocalStorage に置き、変換タスクと同じ関数
+（app.workers.tasks の make_thumbnail / encode_chunk / write_playlists など）で変換する。
+DB・Redis・Celery は使わない。各ステージは新しいプロセスで 1 つずつ実行するため、
+ピーク RSS・CPU 時間はそのステージ（と ffmpeg）だけの値になる。本番のワーカーでは
+レンディション・チャンクは並列に実行される点に注意。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.storage import LocalStorage
+from app.workers import ffmpeg
+
+
+def parse_source(value: str) -> tuple[int, int, int]:
+    """WIDTHxHEIGHTxSECONDS"""
+    try:
+        width, height, seconds = (int(part) for part in value.split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"WIDTHxHEIGHTxSECONDS の形式で指定してください: {value}")
+    return width, height, seconds
+
+
+def generate_source(workdir: Path, width: int, height: int, seconds: int, fps: int) -> Path:
+    """テストパターンとサイン波の元動画を生成（同じ条件なら再利用）"""
+    path = workdir / f"source_{width}x{height}_{seconds}s_{fps}fps.mp4"
+    if path.exists():
+        return path
+    ffmpeg.run([
+        "ffmpeg", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=48000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", str(path),
+    ])
+    return path
+
+
+def run_stage(kind: str, storage_root: str, video_id: str, options: dict, params: dict) -> tuple[object, list[dict]]:
+    """子プロセスで 1 ステージを実行し、結果と計測値を返す"""
+    from app.workers import stages, tasks
+
+    settings.transcode_x264_preset = options["preset"]
+    settings.transcode_upload_concurrency = options["upload_concurrency"]
+    storage = LocalStorage(storage_root)
+    input_url = storage.presign("GET", params.get("source_key", ""))
+    collected: list[dict] = []
+    stages.add_hook(lambda stats: collected.append(stats.as_dict()))
+
+    if kind == "dedup":
+        with stages.stage("dedup"):
+            result = tasks.content_hash(storage, params["source_key"])
+    elif kind == "probe":
+        with stages.stage("probe"):
+            result = ffmpeg.probe(input_url)
+    elif kind == "thumbnail":
+        with tempfile.TemporaryDirectory() as tmpdir:
+            result = tasks.make_thumbnail(storage, input_url, video_id, tmpdir)
+    elif kind == "encode":
+        rendition = ffmpeg.RENDITIONS_BY_NAME[params["rendition"]]
+        result = tasks.encode_chunk(storage, input_url, video_id, rendition, params["index"], params["start"], params["duration"])
+    elif kind == "playlists":
+        result = tasks.write_playlists(storage, video_id, params["segments_by_rendition"])
+    else:
+        raise ValueError(f"unknown stage: {kind}")
+    return result, collected
+
+
+def run_case(pool: ProcessPoolExecutor, source: Path, storage_root: str, options: dict) -> dict:
+    """1 つの元動画・設定の組み合わせで全ステージを順に実行"""
+    storage = LocalStorage(storage_root)
+    video_id = str(uuid.uuid4())
+    source_key = f"videos/{video_id}/original.mp4"
+    storage.upload_file(str(source), source_key, "video/mp4")
+    params = {"source_key": source_key}
+    measured: list[dict] = []
+
+    def stage(kind: str, **extra):
+        result, collected = pool.submit(run_stage, kind, storage_root, video_id, options, {**params, **extra}).result()
+        measured.extend(collected)
+        return result
+
+    stage("dedup")
+    info = stage("probe")
+    stage("thumbnail")
+
+    chunks = ffmpeg.plan_chunks(info["duration"], options["chunk_seconds"])
+    segments_by_rendition: dict[str, list[tuple[int, list]]] = {}
+    for rendition in ffmpeg.select_renditions(info["height"]):
+        for index, (start, duration) in enumerate(chunks):
+            segments = stage("encode", rendition=rendition["name"], index=index, start=start, duration=duration)
+            segments_by_rendition.setdefault(rendition["name"], []).append((index, segments))
+    stage("playlists", segments_by_rendition=segments_by_rendition)
+
+    renditions = {}
+    for entry in measured:
+        if entry["stage"] == "encode":
+            totals = renditions.setdefault(entry["rendition"], {"wall_seconds": 0.0, "cpu_seconds": 0.0, "output_mb": 0.0})
+            for key in totals:
+                totals[key] = round(totals[key] + entry[key], 3)
+    return {
+        "source": {"file": source.name, "mb": round(source.stat().st_size / 2**20, 2), **info},
+        "options": options,
+        "chunks": len(chunks),
+        "stages": measured,
+        "renditions": renditions,
+        "total": {
+            "wall_seconds": round(sum(entry["wall_seconds"] for entry in measured), 3),
+            "cpu_seconds": round(sum(entry["cpu_seconds"] for entry in measured), 3),
+            "output_mb": round(sum(entry["output_mb"] for entry in measured), 2),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=lambda value: [parse_source(v) for v in value.split(",")], default="1280x720x60,1920x1080x60")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--presets", type=lambda value: value.split(","), default=[settings.transcode_x264_preset])
+    parser.add_argument("--chunk-seconds", type=int, help="チャンク分割する場合のチャンク長（省略時は分割しない）")
+    parser.add_argument("--upload-concurrency", type=int, default=settings.transcode_upload_concurrency)
+    parser.add_argument("--workdir", type=Path, help="元動画・出力の置き場所（省略時は一時ディレクトリ）")
+    parser.add_argument("--output", type=Path, help="結果の JSON の保存先")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        # ステージごとに新しいプロセスを使い、ピーク RSS などが前のステージの影響を受けないようにする
+        context = multiprocessing.get_context("spawn")
+        results = []
+        with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as pool:
+            for width, height, seconds in args.sources:
+                source = generate_source(workdir, width, height, seconds, args.fps)
+                for preset in args.presets:
+                    options = {
+                        "preset": preset,
+                        "chunk_seconds": args.chunk_seconds,
+                        "upload_concurrency": args.upload_concurrency,
+                    }
+                    storage_root = str(workdir / "storage")
+                    os.makedirs(storage_root, exist_ok=True)
+                    results.append(run_case(pool, source, storage_root, options))
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""テスト共通のフィクスチャ
+
+docker-compose の db / redis に対して実行する（事前に alembic upgrade head を済ませておく）。
+テストで作成した行は各テストの終了時に削除する。
+"""
+import asyncio
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, event
+
+from app.core import create_access_token
+from app.core.principal import principal_cache
+from app.database import engine, async_session_maker
+from app.main import app
+from app.models import User, Channel, Video, VideoVisibility, VideoStatus, Like, Comment
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    # エンジンのコネクションプールと Redis クライアントはループをまたいで使えないため、全テストで共有する
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@contextmanager
+def count_statements():
+    """ブロック内で発行されたSQL文を記録する（N+1 検出用）"""
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_statement_count(expected: int):
+    """ブロック内のSQL文の数が expected と一致することを確認する"""
+    with count_statements() as statements:
+        yield statements
+    assert len(statements) == expected, (
+        f"SQL文の数が想定と異なります: expected={expected}, actual={len(statements)}\n"
+        + "\n".join(statements)
+    )
+
+
+@pytest_asyncio.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest_asyncio.fixture
+async def db():
+    async with async_session_maker() as session:
+        yield session
+
+
+@pytest_asyncio.fixture
+async def factory(db):
+    """ユーザー・チャンネル・動画を作成し、テスト終了時にまとめて削除する"""
+    created: dict[type, list] = {User: [], Channel: [], Video: []}
+
+    class Factory:
+        async def user(self, **values) -> User:
+            return (await self.users(1, **values))[0]
+
+        async def users(self, count: int, **values) -> list[User]:
+            users = [
+                User(
+                    email=f"test-{uuid.uuid4().hex}@example.com",
+                    password_hash="-",
+                    display_name="test user",
+                    **values,
+                )
+                for _ in range(count)
+            ]
+            db.add_all(users)
+            await db.commit()
+            created[User].extend(user.id for user in users)
+            return users
+
+        async def channel(self, owner: User | None = None) -> Channel:
+            owner = owner or await self.user()
+            channel = Channel(owner_user_id=owner.id, name="test channel")
+            db.add(channel)
+            await db.commit()
+            created[Channel].append(channel.id)
+            return channel
+
+        async def video(self, channel: Channel | None = None, **values) -> Video:
+            channel = channel or await self.channel()
+            values.setdefault("visibility", VideoVisibility.PUBLIC)
+            values.setdefault("status", VideoStatus.PUBLISHED)
+            values.setdefault("published_at", datetime.utcnow())
+            video = Video(channel_id=channel.id, title="テスト動画", **values)
+            db.add(video)
+            await db.commit()
+            created[Video].append(video.id)
+            return video
+
+        def token(self, user: User) -> str:
+            return create_access_token(data={"sub": str(user.id)})
+
+    yield Factory()
+
+    await db.rollback()
+    if created[Video]:
+        await db.execute(delete(Like).where(Like.video_id.in_(created[Video])))
+        await db.execute(delete(Comment).where(Comment.video_id.in_(created[Video])))
+        await db.execute(delete(Video).where(Video.id.in_(created[Video])))
+    if created[Channel]:
+        await db.execute(delete(Channel).where(Channel.id.in_(created[Channel])))
+    if created[User]:
+        await db.execute(delete(Like).where(Like.user_id.in_(created[User])))
+        await db.execute(delete(Comment).where(Comment.user_id.in_(created[User])))
+        await db.execute(delete(User).where(User.id.in_(created[User])))
+    await db.commit()
+    principal_cache.clear()
@@ -0,0 +1,52 @@
+"""いいねの同時実行"""
+import asyncio
+import random
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Like, Video
+
+pytestmark = pytest.mark.asyncio
+
+# 同時に送るリクエストの上限（DB のコネクションプールの待ち時間に収まる程度）
+CONCURRENCY = 200
+
+
+async def send_all(client, video_id, requests: list[tuple[str, str]]) -> list[int]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def send(token: str, method: str) -> int:
+        async with semaphore:
+            response = await client.request(
+                method, f"/videos/{video_id}/like", headers={"Authorization": f"Bearer {token}"}
+            )
+        return response.status_code
+
+    return await asyncio.gather(*(send(token, method) for token, method in requests))
+
+
+async def counters(db, video_id) -> tuple[int, int]:
+    like_count = (await db.execute(select(Video.like_count).where(Video.id == video_id))).scalar_one()
+    likes = (await db.execute(select(func.count()).select_from(Like).where(Like.video_id == video_id))).scalar_one()
+    return like_count, likes
+
+
+@pytest.mark.parametrize("users, requests_per_user", [(10, 6), (1000, 2)])
+async def test_concurrent_like_and_unlike_keep_like_count_consistent(client, db, factory, users, requests_per_user):
+    video = await factory.video()
+    tokens = [factory.token(user) for user in await factory.users(users)]
+    rng = random.Random(0)
+
+    # 同じユーザーの PUT / DELETE を重複・競合させる
+    mixed = [(token, rng.choice(["PUT", "PUT", "DELETE"])) for token in tokens for _ in range(requests_per_user)]
+    rng.shuffle(mixed)
+    assert set(await send_all(client, video.id, mixed)) == {200}
+    like_count, likes = await counters(db, video.id)
+    assert like_count == likes
+
+    # 全員が重複していいね → 全員が重複して解除
+    for method, expected in (("PUT", users), ("DELETE", 0)):
+        requests = [(token, method) for token in tokens] * 2
+        rng.shuffle(requests)
+        assert set(await send_all(client, video.id, requests)) == {200}
+        assert await counters(db, video.id) == (expected, expected)
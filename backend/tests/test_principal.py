@@ -0,0 +1,32 @@
+"""プリンシパルキャッシュの無効化"""
+import pytest
+
+from app.api.auth import get_current_user
+from app.core.principal import principal_cache
+from app.models import UserRole
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_role_change_invalidates_cache_after_commit(db, factory):
+    user = await factory.user()
+    await get_current_user(factory.token(user), db)
+
+    user.role = UserRole.CREATOR
+    await db.flush()
+    # コミット前は他のリクエストが古い行を読めるため、まだ消さない
+    assert principal_cache.get(user.id) is not None
+
+    await db.commit()
+    assert principal_cache.get(user.id) is None
+    assert (await get_current_user(factory.token(user), db)).role == UserRole.CREATOR.value
+
+
+async def test_rolled_back_change_keeps_cache(db, factory):
+    user = await factory.user()
+    await get_current_user(factory.token(user), db)
+
+    user.role = UserRole.ADMIN
+    await db.flush()
+    await db.rollback()
+    assert principal_cache.get(user.id) is not None
@@ -0,0 +1,49 @@
+"""ホットなエンドポイントが発行するSQL文の数（N+1 の再発防止）"""
+import pytest
+
+from app.api.auth import get_current_user
+from app.core.config import settings
+from app.core.principal import principal_cache
+from .conftest import assert_statement_count
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_get_current_user_uses_principal_cache(db, factory):
+    user = await factory.user()
+    token = factory.token(user)
+    principal_cache.clear()
+
+    with assert_statement_count(1):
+        principal = await get_current_user(token, db)
+    assert principal.id == user.id
+
+    # 2回目以降はプリンシパルキャッシュから返す
+    with assert_statement_count(0):
+        await get_current_user(token, db)
+
+
+async def test_get_video_loads_channel_in_one_statement(client, factory):
+    video = await factory.video()
+
+    with assert_statement_count(1):
+        response = await client.get(f"/videos/{video.id}")
+    assert response.status_code == 200
+    assert response.json()["channel"]["id"] == str(video.channel_id)
+
+
+@pytest.mark.parametrize("params", [
+    {"sort": "new"},
+    {"sort": "new", "page": 2},
+    {"q": "テスト動画"},
+])
+async def test_list_videos_does_not_load_channels_per_row(client, factory, monkeypatch, params):
+    # レスポンスキャッシュを使わずに毎回生成させる
+    monkeypatch.setattr(settings, "response_cache_listing_max_page", 0)
+    channel = await factory.channel()
+    for _ in range(3):
+        await factory.video(channel)
+
+    with assert_statement_count(1):
+        response = await client.get("/videos", params={**params, "per_page": 2, "with_total": "false"})
+    assert response.status_code == 200
@@ -0,0 +1,65 @@
+"""LocalStorage（DB・Redis なしで実行できる）"""
+from urllib.parse import urlparse
+import pytest
+
+from app.core.storage import LocalStorage, S3Storage, StorageError
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path))
+
+
+def test_put_get_delete_round_trip(storage):
+    storage.put("videos/1/thumbnail.jpg", b"jpeg", "image/jpeg")
+
+    assert storage.get("videos/1/thumbnail.jpg") == b"jpeg"
+    assert storage.exists("videos/1/thumbnail.jpg")
+    assert storage.size("videos/1/thumbnail.jpg") == 4
+    assert b"".join(storage.iter_chunks("videos/1/thumbnail.jpg", chunk_size=3)) == b"jpeg"
+    # プリサインURLは FFmpeg がそのまま読める file:// URL
+    with open(urlparse(storage.presign("GET", "videos/1/thumbnail.jpg")).path, "rb") as f:
+        assert f.read() == b"jpeg"
+
+    storage.delete("videos/1/thumbnail.jpg")
+    assert not storage.exists("videos/1/thumbnail.jpg")
+    assert storage.size("videos/1/thumbnail.jpg") is None
+    with pytest.raises(StorageError):
+        storage.get("videos/1/thumbnail.jpg")
+    storage.delete("videos/1/thumbnail.jpg")  # 存在しなくてもエラーにしない
+
+
+def test_multipart_upload_through_presigned_part_urls(storage):
+    upload_id = storage.create_multipart_upload("uploads/1/original.mp4")
+    assert [u["upload_id"] for u in storage.list_multipart_uploads("uploads/")] == [upload_id]
+
+    # クライアントがパートURLへ書き込む（送信順は問わない）
+    for number, data in ((2, b"world"), (1, b"hello ")):
+        with open(urlparse(storage.presign_upload_part("uploads/1/original.mp4", upload_id, number)).path, "wb") as f:
+            f.write(data)
+    storage.complete_multipart_upload("uploads/1/original.mp4", upload_id, [(2, "b"), (1, "a")])
+
+    assert storage.get("uploads/1/original.mp4") == b"hello world"
+    assert storage.list_multipart_uploads("uploads/") == []
+
+
+def test_delete_prefix(storage):
+    for name in ("master.m3u8", "360p/playlist.m3u8", "360p/seg_00000.ts"):
+        storage.put(f"videos/1/{name}", b"x")
+    storage.put("videos/10/master.m3u8", b"x")
+
+    assert storage.delete_prefix("videos/1/") == 3
+    assert not storage.exists("videos/1/master.m3u8")
+    assert storage.exists("videos/10/master.m3u8")
+
+
+def test_rejects_keys_outside_root(storage):
+    with pytest.raises(StorageError):
+        storage.put("../outside", b"x")
+
+
+@pytest.mark.parametrize("use_ssl, scheme", [(True, "https"), (False, "http")])
+def test_s3_urls_follow_use_ssl(use_ssl, scheme):
+    storage = S3Storage("minio:9000", "videos", "key", "secret", use_ssl=use_ssl)
+    assert storage.public_url("a.mp4").startswith(f"{scheme}://minio:9000/")
+    assert storage.presign("GET", "a.mp4").startswith(f"{scheme}://minio:9000/")